@@ -0,0 +1,231 @@
+"""
+Structured logging shared by the backend and the worker
+Callers only enqueue records; a background listener thread formats them
+(JSON or text) and writes them to stdout. Correlation fields come from
+log_context, and records logged with sample=True can be thinned per level
+"""
+import os
+import sys
+import copy
+import json
+import queue
+import atexit
+import random
+import logging
+import contextvars
+import logging.handlers
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, Any, Optional
+
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json")  # json, text
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+# Keep-ratio per level for records logged with sample=True, e.g. "INFO=0.1,DEBUG=0.01"
+LOG_SAMPLE_RATES = os.getenv("LOG_SAMPLE_RATES", "")
+
+# Correlation fields (signal_id, user_id, request_id, ...) attached to every record
+_log_context: contextvars.ContextVar = contextvars.ContextVar("humbex_log_context", default={})
+
+# Attributes every LogRecord has; anything else was passed through extra=
+_RECORD_ATTRIBUTES = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime"}
+
+
+@contextmanager
+def log_context(**fields):
+    """
+    Attach correlation fields to every record logged inside the block
+
+    Usage:
+        with log_context(signal_id=signal.id):
+            logger.info("Processing")
+    """
+    token = _log_context.set({**_log_context.get(), **fields})
+    try:
+        yield
+    finally:
+        _log_context.reset(token)
+
+
+def bind_log_context(**fields):
+    """Add correlation fields to the current log_context block"""
+    _log_context.set({**_log_context.get(), **fields})
+
+
+class ContextFilter(logging.Filter):
+    """Copy static and correlation fields onto the record in the caller's thread"""
+
+    def __init__(self, **static_fields):
+        super().__init__()
+        self.static_fields = static_fields
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        for key, value in {**self.static_fields, **_log_context.get()}.items():
+            if not hasattr(record, key):
+                setattr(record, key, value)
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Drop a share of records logged with extra={"sample": True}
+
+    Meant for high-volume success lines; warnings, errors and unmarked
+    records always pass.
+    """
+
+    def __init__(self, rates: Dict[int, float]):
+        super().__init__()
+        self.rates = rates
+        self.sampled_out = 0
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if not getattr(record, "sample", False):
+            return True
+        rate = self.rates.get(record.levelno, 1.0)
+        if rate >= 1.0 or random.random() < rate:
+            return True
+        self.sampled_out += 1
+        return False
+
+
+class BoundedQueueHandler(logging.handlers.QueueHandler):
+    """
+    QueueHandler that never blocks the caller
+
+    When the queue is full the record is dropped and counted; the next
+    record that fits is preceded by a warning with the number dropped.
+    """
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+        self._reported = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        """Resolve the message and traceback text, keeping extra fields intact"""
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            if self.dropped > self._reported:
+                missed = self.dropped - self._reported
+                notice = logging.LogRecord(
+                    record.name, logging.WARNING, __file__, 0,
+                    f"Log queue full, dropped {missed} record(s)", None, None
+                )
+                notice.dropped_total = self.dropped
+                self.queue.put_nowait(notice)
+                self._reported = self.dropped
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class JSONFormatter(logging.Formatter):
+    """One JSON object per line with correlation and extra fields"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.utcfromtimestamp(record.created).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRIBUTES and key != "sample":
+                entry[key] = value
+        if record.exc_text:
+            entry["exc_info"] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    """Human-readable format for local development"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        fields = " ".join(
+            f"{key}={value}" for key, value in vars(record).items()
+            if key not in _RECORD_ATTRIBUTES and key != "sample"
+        )
+        line = f"[{datetime.utcfromtimestamp(record.created).isoformat()}] {record.getMessage()}"
+        if fields:
+            line = f"{line} ({fields})"
+        if record.exc_text:
+            line = f"{line}\n{record.exc_text}"
+        return line
+
+
+def _parse_sample_rates(spec: str) -> Dict[int, float]:
+    """Parse "INFO=0.1,DEBUG=0.01" into {logging.INFO: 0.1, ...}"""
+    rates = {}
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        level, _, rate = item.partition("=")
+        rates[logging.getLevelName(level.strip().upper())] = float(rate)
+    return rates
+
+
+# Singleton pipeline state (one per process)
+_queue_handler: Optional[BoundedQueueHandler] = None
+_sampling_filter: Optional[SamplingFilter] = None
+_listener: Optional[logging.handlers.QueueListener] = None
+
+
+def setup_logging(service: str) -> logging.Logger:
+    """
+    Route the root logger through a bounded queue to a background writer
+
+    Callers only enqueue; JSON serialization and the stdout write/flush
+    happen on the listener thread. The first call in a process sets up the
+    pipeline; later calls just return a logger.
+
+    Args:
+        service: Added to every record as the "service" field (first call wins)
+
+    Returns:
+        Logger named "humbex.<service>"
+    """
+    global _queue_handler, _sampling_filter, _listener
+
+    if _listener is None:
+        stream_handler = logging.StreamHandler(sys.stdout)
+        stream_handler.setFormatter(JSONFormatter() if LOG_FORMAT == "json" else TextFormatter())
+
+        _sampling_filter = SamplingFilter(_parse_sample_rates(LOG_SAMPLE_RATES))
+        _queue_handler = BoundedQueueHandler(queue.Queue(maxsize=LOG_QUEUE_SIZE))
+        _queue_handler.addFilter(_sampling_filter)
+        _queue_handler.addFilter(ContextFilter(service=service))
+
+        root = logging.getLogger()
+        root.handlers = [_queue_handler]
+        root.setLevel(LOG_LEVEL)
+
+        # Uvicorn may have installed its own synchronous handlers already
+        # (a logger it disabled has none and stays disabled)
+        for name in ("uvicorn", "uvicorn.error", "uvicorn.access"):
+            uvicorn_logger = logging.getLogger(name)
+            if uvicorn_logger.handlers:
+                uvicorn_logger.handlers = []
+                uvicorn_logger.propagate = True
+
+        _listener = logging.handlers.QueueListener(_queue_handler.queue, stream_handler)
+        _listener.start()
+        atexit.register(_listener.stop)
+
+    return logging.getLogger(f"humbex.{service}")
+
+
+def get_log_stats() -> Dict[str, Any]:
+    """Drop and sampling counters of this process's pipeline"""
+    return {
+        "dropped": _queue_handler.dropped if _queue_handler else 0,
+        "sampled_out": _sampling_filter.sampled_out if _sampling_filter else 0,
+        "queued": _queue_handler.queue.qsize() if _queue_handler else 0,
+    }
@@ -1,17 +1,26 @@
 import os
 import hmac
+import time
+import uuid
 import hashlib
 from datetime import datetime
 from typing import Optional
 from contextlib import asynccontextmanager
 
-from fastapi import FastAPI, Request, HTTPException, status
-from fastapi.responses import JSONResponse
+from fastapi import FastAPI, Request, HTTPException, status, Depends, Query
+from fastapi.responses import JSONResponse, StreamingResponse
 from pydantic import BaseModel, Field
 from sqlalchemy.orm import Session
 
 from .db import get_db, engine, Base
-from .models import Signal
+from .logs import setup_logging, log_context, get_log_stats
+from .models import Signal, Order, UserStats
+from .services.history import paginate, signal_to_dict, order_to_dict
+from .services.stats import stats_to_dict
+from .services.profiling import get_profiler, get_flight_recorder
+from .services.export import EXPORT_FORMATS, stream_export
+
+logger = setup_logging("backend")
 
 
 @asynccontextmanager
@@ -20,8 +29,17 @@ async def lifespan(app: FastAPI):
     try:
         Base.metadata.create_all(bind=engine)
     except Exception as e:
-        print(f"Warning: Could not create tables: {e}")
+        logger.warning(f"Could not create tables: {e}")
+    
+    # Co-located mode: the worker attaches an InProcessHandoff before startup
+    signal_sink = getattr(app.state, "signal_sink", None)
+    if signal_sink is not None:
+        await signal_sink.start()
+    
     yield
+    
+    if signal_sink is not None:
+        await signal_sink.stop()
 
 
 app = FastAPI(
@@ -31,8 +49,41 @@ app = FastAPI(
     lifespan=lifespan
 )
 
+
 # Environment variables
 TRADINGVIEW_SECRET = os.getenv("TRADINGVIEW_SECRET", "changeme")
+ADMIN_API_TOKEN = os.getenv("ADMIN_API_TOKEN", "")
+
+
+@app.middleware("http")
+async def log_requests(request: Request, call_next):
+    """Structured access log, correlated by X-Request-ID"""
+    request_id = request.headers.get("X-Request-ID") or uuid.uuid4().hex
+    start = time.perf_counter()
+    
+    with log_context(request_id=request_id):
+        try:
+            response = await call_next(request)
+        except Exception:
+            logger.exception(
+                "Unhandled error",
+                extra={"method": request.method, "path": request.url.path}
+            )
+            raise
+        
+        logger.info(
+            f"{request.method} {request.url.path} {response.status_code}",
+            extra={
+                "method": request.method,
+                "path": request.url.path,
+                "status_code": response.status_code,
+                "duration_ms": round((time.perf_counter() - start) * 1000, 3),
+                "sample": response.status_code < 400
+            }
+        )
+    
+    response.headers["X-Request-ID"] = request_id
+    return response
 
 
 class WebhookPayload(BaseModel):
@@ -64,13 +115,30 @@ def verify_signature(body: bytes, signature: str) -> bool:
     return hmac.compare_digest(signature.lower(), expected_signature.lower())
 
 
+def require_admin_token(request: Request):
+    """
+    Dependency guarding internal read endpoints
+    
+    Requires the X-Admin-Token header to match ADMIN_API_TOKEN. Endpoints are
+    disabled entirely while ADMIN_API_TOKEN is unset.
+    """
+    token = request.headers.get("X-Admin-Token", "")
+    
+    if not ADMIN_API_TOKEN or not hmac.compare_digest(token, ADMIN_API_TOKEN):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid or missing X-Admin-Token header"
+        )
+
+
 @app.get("/health")
 async def health_check():
     """Health check endpoint"""
     return {
         "status": "healthy",
         "service": "humbex-backend",
-        "timestamp": datetime.utcnow().isoformat()
+        "timestamp": datetime.utcnow().isoformat(),
+        "logging": get_log_stats()
     }
 
 
@@ -119,6 +187,29 @@ async def webhook_handler(request: Request, payload: WebhookPayload):
             detail=f"Invalid action. Must be one of: {', '.join(valid_actions)}"
         )
     
+    # Co-located mode: journal and hand off to the in-process engine
+    signal_sink = getattr(request.app.state, "signal_sink", None)
+    if signal_sink is not None:
+        record = await signal_sink.submit(
+            token=payload.token,
+            action=payload.action.lower(),
+            symbol=payload.symbol.upper(),
+            quantity=payload.quantity,
+            price=payload.price
+        )
+        
+        logger.info(
+            "Signal journaled",
+            extra={"journal_id": record["journal_id"], "action": record["action"], "symbol": record["symbol"], "sample": True}
+        )
+        
+        return {
+            "status": "success",
+            "message": "Signal journaled and queued for execution",
+            "journal_id": record["journal_id"],
+            "timestamp": record["received_at"]
+        }
+    
     # Store signal in database
     db: Session = next(get_db())
     
@@ -137,6 +228,11 @@ async def webhook_handler(request: Request, payload: WebhookPayload):
         db.commit()
         db.refresh(signal)
         
+        logger.info(
+            "Signal stored",
+            extra={"signal_id": signal.id, "action": signal.action, "symbol": signal.symbol, "sample": True}
+        )
+        
         return {
             "status": "success",
             "message": "Signal received and queued for processing",
@@ -146,6 +242,7 @@ async def webhook_handler(request: Request, payload: WebhookPayload):
     
     except Exception as e:
         db.rollback()
+        logger.error(f"Failed to store signal: {e}")
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Failed to store signal: {str(e)}"
@@ -154,6 +251,156 @@ async def webhook_handler(request: Request, payload: WebhookPayload):
         db.close()
 
 
+@app.get("/signals", dependencies=[Depends(require_admin_token)])
+def list_signals(
+    user_id: Optional[int] = None,
+    signal_status: Optional[str] = Query(None, alias="status"),
+    cursor: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=500)
+):
+    """
+    Signal history, newest first
+    
+    Keyset-paginated on (received_at, id): pass the returned next_cursor
+    to fetch the following page.
+    """
+    db: Session = next(get_db())
+    
+    try:
+        query = db.query(Signal)
+        if user_id is not None:
+            query = query.filter(Signal.user_id == user_id)
+        if signal_status:
+            query = query.filter(Signal.status == signal_status)
+        
+        rows, next_cursor = paginate(query, Signal.received_at, Signal.id, cursor, limit)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    finally:
+        db.close()
+    
+    return {
+        "items": [signal_to_dict(row) for row in rows],
+        "next_cursor": next_cursor
+    }
+
+
+@app.get("/orders", dependencies=[Depends(require_admin_token)])
+def list_orders(
+    user_id: Optional[int] = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=500)
+):
+    """
+    Order history, newest first
+    
+    Keyset-paginated on (created_at, id): pass the returned next_cursor
+    to fetch the following page.
+    """
+    db: Session = next(get_db())
+    
+    try:
+        query = db.query(Order)
+        if user_id is not None:
+            query = query.filter(Order.user_id == user_id)
+        
+        rows, next_cursor = paginate(query, Order.created_at, Order.id, cursor, limit)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    finally:
+        db.close()
+    
+    return {
+        "items": [order_to_dict(row) for row in rows],
+        "next_cursor": next_cursor
+    }
+
+
+@app.get("/users/{user_id}/stats", dependencies=[Depends(require_admin_token)])
+def get_user_stats(user_id: int):
+    """
+    Precomputed trading aggregates for a user
+    
+    Volume, fill rate, realized PnL and latency percentiles are maintained
+    incrementally by the worker, so this is a single primary-key lookup.
+    """
+    db: Session = next(get_db())
+    
+    try:
+        stats = db.query(UserStats).filter(UserStats.user_id == user_id).first()
+        if stats is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="No stats recorded for this user"
+            )
+        return stats_to_dict(stats)
+    finally:
+        db.close()
+
+
+@app.post("/admin/profiler/start", dependencies=[Depends(require_admin_token)])
+async def start_profiler():
+    """Start the sampling profiler in the backend process"""
+    started = get_profiler().start()
+    return {"status": "started" if started else "already_running"}
+
+
+@app.post("/admin/profiler/stop", dependencies=[Depends(require_admin_token)])
+async def stop_profiler():
+    """Stop the sampling profiler and return the hottest stacks"""
+    profiler = get_profiler()
+    report = profiler.stop()
+    report["dump"] = profiler.dump()
+    return report
+
+
+@app.get("/admin/profiler", dependencies=[Depends(require_admin_token)])
+async def profiler_status():
+    """Current profiler state and hottest stacks so far"""
+    return get_profiler().report()
+
+
+@app.get("/admin/flight-recorder", dependencies=[Depends(require_admin_token)])
+async def flight_recorder():
+    """
+    Slow signal executions recorded in this process
+    
+    Only populated in co-located mode; the standalone worker dumps its
+    recorder on SIGUSR2.
+    """
+    return {"entries": get_flight_recorder().snapshot()}
+
+
+@app.get("/export/{table}", dependencies=[Depends(require_admin_token)])
+def export_table(
+    table: str,
+    export_format: str = Query("ndjson", alias="format"),
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    user_id: Optional[int] = None,
+    cursor: Optional[str] = None
+):
+    """
+    Stream all signals or orders matching the filters, oldest first
+
+    Rows are read in bounded chunks and sent as they are fetched, so the
+    export runs in constant memory whatever its size. An interrupted export
+    resumes with the cursor of the last row received (see README); a
+    resumed CSV export has no header row, as it continues the first part.
+    """
+    try:
+        chunks = stream_export(table, export_format, start=start, end=end, user_id=user_id, cursor=cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+    filename = f"{table}.{export_format}"
+    return StreamingResponse(
+        chunks,
+        media_type=EXPORT_FORMATS[export_format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
+
 @app.get("/")
 async def root():
     """Root endpoint"""
@@ -164,6 +411,12 @@ async def root():
         "endpoints": {
             "health": "/health",
             "webhook": "/webhook (POST)",
+            "signals": "/signals (GET, admin)",
+            "orders": "/orders (GET, admin)",
+            "user_stats": "/users/{user_id}/stats (GET, admin)",
+            "profiler": "/admin/profiler (GET), /admin/profiler/start|stop (POST, admin)",
+            "flight_recorder": "/admin/flight-recorder (GET, admin)",
+            "export": "/export/{signals|orders} (GET, admin)",
             "docs": "/docs"
         }
     }
@@ -175,4 +428,5 @@ if __name__ == "__main__":
     host = os.getenv("BACKEND_HOST", "0.0.0.0")
     port = int(os.getenv("BACKEND_PORT", "8000"))
     
-    uvicorn.run(app, host=host, port=port)
+    # Requests are logged by log_requests through the queue; skip uvicorn's synchronous access log
+    uvicorn.run(app, host=host, port=port, access_log=False, log_config=None)
@@ -1,5 +1,5 @@
 from datetime import datetime
-from sqlalchemy import Column, Integer, String, Float, DateTime, Boolean, ForeignKey, Text
+from sqlalchemy import Column, Integer, String, Float, DateTime, Boolean, ForeignKey, Text, JSON, Index
 from sqlalchemy.orm import relationship
 
 from .db import Base
@@ -21,6 +21,8 @@ class User(Base):
     api_keys = relationship("APIKey", back_populates="user")
     signals = relationship("Signal", back_populates="user")
     orders = relationship("Order", back_populates="user")
+    stats = relationship("UserStats", back_populates="user", uselist=False)
+    risk_limits = relationship("RiskLimits", back_populates="user", uselist=False)
 
 
 class Subscription(Base):
@@ -33,7 +35,7 @@ class Subscription(Base):
     expires_at = Column(DateTime, nullable=True)
     payment_reference = Column(String(255), nullable=True)  # MEXC payment reference
     created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
-    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False, index=True)  # Entitlement refresh watermark
     
     # Relationships
     user = relationship("User", back_populates="subscriptions")
@@ -60,6 +62,11 @@ class APIKey(Base):
 class Signal(Base):
     """TradingView webhook signals"""
     __tablename__ = "signals"
+    __table_args__ = (
+        # Keyset pagination on (received_at, id), globally and per user
+        Index("ix_signals_received_at_id", "received_at", "id"),
+        Index("ix_signals_user_received_at_id", "user_id", "received_at", "id"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     token = Column(String(100), nullable=False, index=True)  # User token from webhook
@@ -72,6 +79,9 @@ class Signal(Base):
     error_message = Column(Text, nullable=True)
     received_at = Column(DateTime, default=datetime.utcnow, nullable=False)
     processed_at = Column(DateTime, nullable=True)
+    journal_id = Column(String(36), unique=True, nullable=True)  # Set in co-located mode (see services/handoff.py)
+    attempts = Column(Integer, default=0, nullable=False)  # Executions started; >1 means an earlier one was interrupted
+    claimed_by = Column(String(100), nullable=True)  # "<WORKER_ID>:<pid>" of the worker processing it
     
     # Relationships
     user = relationship("User", back_populates="signals")
@@ -81,6 +91,11 @@ class Signal(Base):
 class Order(Base):
     """Trade execution records"""
     __tablename__ = "orders"
+    __table_args__ = (
+        # Keyset pagination on (created_at, id), globally and per user
+        Index("ix_orders_created_at_id", "created_at", "id"),
+        Index("ix_orders_user_created_at_id", "user_id", "created_at", "id"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     signal_id = Column(Integer, ForeignKey("signals.id"), nullable=False)
@@ -103,3 +118,40 @@ class Order(Base):
     # Relationships
     signal = relationship("Signal", back_populates="orders")
     user = relationship("User", back_populates="orders")
+
+
+class UserStats(Base):
+    """Per-user trading aggregates, updated incrementally by the worker"""
+    __tablename__ = "user_stats"
+    
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    signals_total = Column(Integer, default=0, nullable=False)
+    signals_completed = Column(Integer, default=0, nullable=False)
+    signals_failed = Column(Integer, default=0, nullable=False)
+    orders_total = Column(Integer, default=0, nullable=False)
+    orders_filled = Column(Integer, default=0, nullable=False)
+    volume = Column(Float, default=0.0, nullable=False)  # Filled base quantity
+    notional = Column(Float, default=0.0, nullable=False)  # Filled quantity * average price
+    realized_pnl = Column(Float, default=0.0, nullable=False)
+    positions = Column(JSON, default=dict, nullable=False)  # {symbol: [net_quantity, average_entry_price]}
+    latency_histogram = Column(JSON, default=list, nullable=False)  # Counts per LATENCY_BUCKETS_MS bucket
+    last_signal_at = Column(DateTime, nullable=True)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
+    
+    # Relationships
+    user = relationship("User", back_populates="stats")
+
+
+class RiskLimits(Base):
+    """Per-user position sizing rules and exposure limits"""
+    __tablename__ = "risk_limits"
+    
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    equity_fraction = Column(Float, nullable=True)  # Size orders at this fraction of equity (null: use signal quantity)
+    max_leverage = Column(Float, nullable=True)  # Max (exposure + order notional) / equity (null: RISK_DEFAULT_MAX_LEVERAGE)
+    max_notional = Column(Float, nullable=True)  # Max notional per order (null: RISK_DEFAULT_MAX_NOTIONAL)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
+    
+    # Relationships
+    user = relationship("User", back_populates="risk_limits")
@@ -1,66 +1,388 @@
 """
-CCXT Client wrapper for Bybit trading
+CCXT Client wrapper for perpetual futures trading (Bybit by default)
 Supports dry-run/test mode by default
+
+Every exchange call goes through CCXTClient._call, which enforces a
+per-operation deadline, retries transient network errors (order creation
+is made idempotent with a client order ID), hedges slow read-only calls
+and fails fast through a per-exchange circuit breaker.
+
+ExchangeRegistry builds clients for the exchange named in APIKey.exchange
+and gives every exchange one shared unauthenticated client for public
+market data (markets, tickers, funding)
 """
 import os
-from typing import Optional, Dict, Any
+import time
+import uuid
+import random
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Optional, Dict, Any, Callable
 from datetime import datetime
 
+from ..crypto import get_crypto_manager
+from .profiling import count_exchange_call
+
 try:
     import ccxt
 except ImportError:
     ccxt = None
 
 
+# Per-operation deadlines in seconds, covering all retries of one call
+OPERATION_DEADLINES = {
+    'create_order': float(os.getenv("EXCHANGE_ORDER_DEADLINE", "8")),
+    'fetch_order': float(os.getenv("EXCHANGE_READ_DEADLINE", "5")),
+    'fetch_positions': float(os.getenv("EXCHANGE_READ_DEADLINE", "5")),
+    'fetch_balance': float(os.getenv("EXCHANGE_READ_DEADLINE", "5")),
+    'fetch_ticker': float(os.getenv("EXCHANGE_READ_DEADLINE", "5")),
+    'fetch_funding_rate': float(os.getenv("EXCHANGE_READ_DEADLINE", "5")),
+    'load_markets': float(os.getenv("EXCHANGE_MARKETS_DEADLINE", "15")),
+}
+EXCHANGE_MAX_RETRIES = int(os.getenv("EXCHANGE_MAX_RETRIES", "2"))
+EXCHANGE_RETRY_BACKOFF = float(os.getenv("EXCHANGE_RETRY_BACKOFF", "0.2"))  # Seconds, doubled per attempt
+EXCHANGE_HEDGE_DELAY = float(os.getenv("EXCHANGE_HEDGE_DELAY", "0.5"))  # Seconds before a hedged read is duplicated
+CIRCUIT_FAILURE_THRESHOLD = int(os.getenv("CIRCUIT_FAILURE_THRESHOLD", "5"))
+CIRCUIT_RESET_TIMEOUT = float(os.getenv("CIRCUIT_RESET_TIMEOUT", "30"))  # Seconds open before a trial call
+
+
+class CircuitOpenError(Exception):
+    """Raised when an exchange call is rejected by an open circuit breaker"""
+
+
+class CircuitBreaker:
+    """
+    Per-exchange circuit breaker
+    
+    closed: calls flow, consecutive network failures are counted
+    open: calls fail immediately until reset_timeout has elapsed
+    half_open: one trial call is let through; success closes, failure reopens
+    """
+    
+    def __init__(self, name: str, failure_threshold: int = CIRCUIT_FAILURE_THRESHOLD, reset_timeout: float = CIRCUIT_RESET_TIMEOUT):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = "closed"
+        self.consecutive_failures = 0
+        self.opened_at: Optional[float] = None
+        self.total_failures = 0
+        self.total_rejected = 0
+        self._trial_started: Optional[float] = None
+        self._lock = threading.Lock()
+    
+    def allow(self) -> bool:
+        """Whether a call may be attempted now"""
+        with self._lock:
+            now = time.monotonic()
+            if self.state == "open" and now - self.opened_at >= self.reset_timeout:
+                self.state = "half_open"
+                self._trial_started = None
+            
+            if self.state == "closed":
+                return True
+            # A trial that never reported back is considered lost after reset_timeout
+            if self.state == "half_open" and (
+                self._trial_started is None or now - self._trial_started >= self.reset_timeout
+            ):
+                self._trial_started = now
+                return True
+            
+            self.total_rejected += 1
+            return False
+    
+    def record_success(self):
+        """The exchange answered (even with a business error)"""
+        with self._lock:
+            self.state = "closed"
+            self.consecutive_failures = 0
+            self.opened_at = None
+            self._trial_started = None
+    
+    def record_failure(self):
+        """The exchange could not be reached or timed out"""
+        with self._lock:
+            self.consecutive_failures += 1
+            self.total_failures += 1
+            if self.state == "half_open" or self.consecutive_failures >= self.failure_threshold:
+                self.state = "open"
+                self.opened_at = time.monotonic()
+                self._trial_started = None
+    
+    def snapshot(self) -> Dict[str, Any]:
+        """Current state for monitoring"""
+        with self._lock:
+            return {
+                'state': self.state,
+                'consecutive_failures': self.consecutive_failures,
+                'total_failures': self.total_failures,
+                'total_rejected': self.total_rejected,
+                'open_for': time.monotonic() - self.opened_at if self.opened_at else None,
+            }
+
+
+# Circuit breakers shared by all clients of the same exchange in this process
+_circuit_breakers: Dict[str, CircuitBreaker] = {}
+_circuit_breakers_lock = threading.Lock()
+
+# Threads used to run hedged read-only calls
+_hedge_executor: Optional[ThreadPoolExecutor] = None
+
+
+def get_circuit_breaker(exchange_id: str) -> CircuitBreaker:
+    """Get or create the circuit breaker for an exchange"""
+    with _circuit_breakers_lock:
+        if exchange_id not in _circuit_breakers:
+            _circuit_breakers[exchange_id] = CircuitBreaker(exchange_id)
+        return _circuit_breakers[exchange_id]
+
+
+def get_circuit_breaker_states() -> Dict[str, Dict[str, Any]]:
+    """Snapshot of every circuit breaker, keyed by exchange"""
+    with _circuit_breakers_lock:
+        breakers = list(_circuit_breakers.values())
+    return {breaker.name: breaker.snapshot() for breaker in breakers}
+
+
+def _get_hedge_executor() -> ThreadPoolExecutor:
+    """Get or create the hedging thread pool"""
+    global _hedge_executor
+    
+    if _hedge_executor is None:
+        _hedge_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="ccxt-hedge")
+    
+    return _hedge_executor
+
+
+def new_client_order_id() -> str:
+    """Generate a client order ID (Bybit orderLinkId allows up to 36 chars)"""
+    return f"hx{uuid.uuid4().hex[:30]}"
+
+
 class CCXTClient:
     """
-    Wrapper for CCXT Bybit exchange client
+    Wrapper for a CCXT exchange client
     
     Features:
-    - Dry-run mode by default (test_mode=True)
+    - Dry-run mode by default (test_mode=True): orders, balances and
+      positions are simulated, public market data is live
     - Support for perpetual futures trading
     - Order placement and status checking
+    - Public market data delegated to a shared client (see ExchangeRegistry)
     """
     
     def __init__(
         self,
-        api_key: str,
-        api_secret: str,
-        test_mode: bool = True
+        api_key: Optional[str] = None,
+        api_secret: Optional[str] = None,
+        test_mode: bool = True,
+        exchange_id: str = "bybit",
+        market_data: Optional["CCXTClient"] = None
     ):
         """
         Initialize CCXT client
         
         Args:
-            api_key: Bybit API key (decrypted)
-            api_secret: Bybit API secret (decrypted)
+            api_key: Exchange API key (decrypted); None for a public client
+            api_secret: Exchange API secret (decrypted)
             test_mode: If True, uses testnet/dry-run mode
+            exchange_id: CCXT exchange ID (e.g. 'bybit', 'binance')
+            market_data: Shared public client serving markets, tickers and
+                funding rates for this exchange
         """
         if ccxt is None:
             raise ImportError("ccxt library not installed. Install with: pip install ccxt")
         
+        # ccxt.exchanges lists the exchange classes; other module attributes (Exchange, base, ...) are not
+        if exchange_id not in ccxt.exchanges:
+            raise ValueError(f"Unsupported exchange: {exchange_id}")
+        exchange_class = getattr(ccxt, exchange_id)
+        
         self.test_mode = test_mode
+        self.market_data = market_data
         
-        # Initialize Bybit exchange
-        self.exchange = ccxt.bybit({
-            'apiKey': api_key,
-            'secret': api_secret,
+        config = {
             'enableRateLimit': True,
+            'timeout': int(OPERATION_DEADLINES['create_order'] * 1000),
             'options': {
                 'defaultType': 'swap',  # Perpetual futures
             }
-        })
+        }
+        if api_key:
+            config['apiKey'] = api_key
+            config['secret'] = api_secret
+        
+        self.exchange = exchange_class(config)
         
-        # Use testnet if in test mode
-        if test_mode:
+        # Use testnet if in test mode; public market data is read-only and
+        # comes from the live exchange, so dry-run risk checks see real prices
+        if test_mode and api_key:
             self.exchange.set_sandbox_mode(True)
+        
+        self.circuit_breaker = get_circuit_breaker(self.exchange.id)
+    
+    def _call(
+        self,
+        operation: str,
+        func: Callable[[], Any],
+        hedge: bool = False
+    ) -> Any:
+        """
+        Run an exchange call with deadline, retries and circuit breaker
+        
+        Network errors (timeouts, 5xx, rate limits) are retried with
+        exponential backoff until the operation deadline; exchange errors
+        (rejected orders, insufficient funds) are raised immediately.
+        
+        Args:
+            operation: Key into OPERATION_DEADLINES
+            func: Zero-argument callable performing the request; must be
+                safe to repeat
+            hedge: Duplicate the request if it is still running after
+                EXCHANGE_HEDGE_DELAY (read-only calls only)
+            
+        Returns:
+            Result of func
+            
+        Raises:
+            CircuitOpenError: If the exchange's circuit breaker is open
+            ccxt.RequestTimeout: If the deadline expired
+        """
+        deadline = time.monotonic() + OPERATION_DEADLINES[operation]
+        attempt = 0
+        
+        while True:
+            if not self.circuit_breaker.allow():
+                raise CircuitOpenError(f"Circuit open for {self.exchange.id}, {operation} not attempted")
+            
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise ccxt.RequestTimeout(f"{operation} deadline exceeded")
+            
+            # Bound the underlying HTTP request by what is left of the deadline
+            self.exchange.timeout = max(1, int(remaining * 1000))
+            
+            count_exchange_call()
+            try:
+                if hedge:
+                    result = self._hedged(func, remaining)
+                else:
+                    result = func()
+            except ccxt.NetworkError:
+                self.circuit_breaker.record_failure()
+                attempt += 1
+                backoff = EXCHANGE_RETRY_BACKOFF * (2 ** (attempt - 1)) * random.uniform(0.5, 1.5)
+                if attempt > EXCHANGE_MAX_RETRIES or time.monotonic() + backoff >= deadline:
+                    raise
+                time.sleep(backoff)
+                continue
+            except ccxt.ExchangeError:
+                # The exchange answered: it is healthy even if it rejected the request
+                self.circuit_breaker.record_success()
+                raise
+            
+            self.circuit_breaker.record_success()
+            return result
+    
+    def _hedged(self, func: Callable[[], Any], timeout: float) -> Any:
+        """
+        Run func, firing a second identical request if the first is slow
+        
+        Args:
+            func: Read-only zero-argument callable
+            timeout: Seconds to wait overall
+            
+        Returns:
+            Result of whichever request succeeds first
+        """
+        executor = _get_hedge_executor()
+        started = time.monotonic()
+        futures = [executor.submit(func)]
+        
+        done, _ = wait(futures, timeout=min(EXCHANGE_HEDGE_DELAY, timeout))
+        if not done:
+            count_exchange_call()
+            futures.append(executor.submit(func))
+        
+        error = None
+        pending = set(futures)
+        while pending:
+            remaining = timeout - (time.monotonic() - started)
+            if remaining <= 0:
+                break
+            done, pending = wait(pending, timeout=remaining, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    return future.result()
+                error = future.exception()
+        
+        if error is not None and not pending:
+            raise error
+        raise ccxt.RequestTimeout("Hedged request timed out")
+    
+    def _create_order(
+        self,
+        symbol: str,
+        order_type: str,
+        side: str,
+        amount: float,
+        price: Optional[float],
+        params: Dict[str, Any],
+        resume: bool = False
+    ) -> Dict[str, Any]:
+        """
+        Place an order safely under retries
+        
+        The same clientOrderId is sent on every attempt. Before resending
+        after a failed attempt (which may have reached the exchange even
+        though the response was lost), the order is looked up by
+        clientOrderId; a retry rejected as a duplicate is resolved the same
+        way, so a retry can never double-fill.
+        
+        Args:
+            resume: The order may already exist from an earlier call with
+                the same clientOrderId (e.g. a requeued signal): look it up
+                before the first attempt too
+        """
+        client_order_id = params.get('clientOrderId') or new_client_order_id()
+        params = {**params, 'clientOrderId': client_order_id}
+        attempts = [0]
+        
+        def attempt():
+            attempts[0] += 1
+            retried = resume or attempts[0] > 1
+            if retried:
+                existing = self._find_order_by_client_id(symbol, client_order_id)
+                if existing is not None:
+                    return existing
+            try:
+                return self.exchange.create_order(symbol, order_type, side, amount, price, params)
+            except (ccxt.DuplicateOrderId, ccxt.InvalidOrder):
+                # Bybit reports a duplicate orderLinkId (110072) as InvalidOrder
+                if not retried:
+                    raise
+                existing = self._find_order_by_client_id(symbol, client_order_id)
+                if existing is None:
+                    raise
+                return existing
+        
+        return self._call('create_order', attempt)
+    
+    def _find_order_by_client_id(self, symbol: str, client_order_id: str) -> Optional[Dict[str, Any]]:
+        """Look up a recent order by its client order ID"""
+        for fetch in (self.exchange.fetch_open_orders, self.exchange.fetch_closed_orders):
+            for order in fetch(symbol, limit=50):
+                if order.get('clientOrderId') == client_order_id:
+                    return order
+        return None
     
     def create_market_order(
         self,
         symbol: str,
         side: str,
         amount: float,
-        params: Optional[Dict[str, Any]] = None
+        params: Optional[Dict[str, Any]] = None,
+        resume: bool = False
     ) -> Dict[str, Any]:
         """
         Create a market order
@@ -69,7 +391,9 @@ class CCXTClient:
             symbol: Trading pair (e.g., 'AVAX/USDT:USDT')
             side: 'buy' or 'sell'
             amount: Order quantity
-            params: Additional parameters
+            params: Additional parameters (clientOrderId for idempotency)
+            resume: The order may already have been sent with this
+                clientOrderId (see _create_order)
             
         Returns:
             Order response from exchange
@@ -78,6 +402,7 @@ class CCXTClient:
             # Simulate order in test mode
             return {
                 'id': f'test_{datetime.utcnow().timestamp()}',
+                'clientOrderId': (params or {}).get('clientOrderId'),
                 'symbol': symbol,
                 'side': side,
                 'type': 'market',
@@ -88,12 +413,7 @@ class CCXTClient:
                 'info': {'test_mode': True}
             }
         
-        return self.exchange.create_market_order(
-            symbol=symbol,
-            side=side,
-            amount=amount,
-            params=params or {}
-        )
+        return self._create_order(symbol, 'market', side, amount, None, params or {}, resume)
     
     def create_limit_order(
         self,
@@ -101,7 +421,8 @@ class CCXTClient:
         side: str,
         amount: float,
         price: float,
-        params: Optional[Dict[str, Any]] = None
+        params: Optional[Dict[str, Any]] = None,
+        resume: bool = False
     ) -> Dict[str, Any]:
         """
         Create a limit order
@@ -111,7 +432,9 @@ class CCXTClient:
             side: 'buy' or 'sell'
             amount: Order quantity
             price: Limit price
-            params: Additional parameters
+            params: Additional parameters (clientOrderId for idempotency)
+            resume: The order may already have been sent with this
+                clientOrderId (see _create_order)
             
         Returns:
             Order response from exchange
@@ -120,6 +443,7 @@ class CCXTClient:
             # Simulate order in test mode
             return {
                 'id': f'test_{datetime.utcnow().timestamp()}',
+                'clientOrderId': (params or {}).get('clientOrderId'),
                 'symbol': symbol,
                 'side': side,
                 'type': 'limit',
@@ -131,19 +455,15 @@ class CCXTClient:
                 'info': {'test_mode': True}
             }
         
-        return self.exchange.create_limit_order(
-            symbol=symbol,
-            side=side,
-            amount=amount,
-            price=price,
-            params=params or {}
-        )
+        return self._create_order(symbol, 'limit', side, amount, price, params or {}, resume)
     
     def close_position(
         self,
         symbol: str,
         side: str,
-        amount: Optional[float] = None
+        amount: Optional[float] = None,
+        params: Optional[Dict[str, Any]] = None,
+        resume: bool = False
     ) -> Dict[str, Any]:
         """
         Close an open position
@@ -152,6 +472,9 @@ class CCXTClient:
             symbol: Trading pair (e.g., 'AVAX/USDT:USDT')
             side: 'buy' to close short, 'sell' to close long
             amount: Position size to close (None for full position)
+            params: Additional parameters (clientOrderId for idempotency)
+            resume: The order may already have been sent with this
+                clientOrderId (see _create_order)
             
         Returns:
             Order response from exchange
@@ -160,6 +483,7 @@ class CCXTClient:
             # Simulate position close in test mode
             return {
                 'id': f'test_close_{datetime.utcnow().timestamp()}',
+                'clientOrderId': (params or {}).get('clientOrderId'),
                 'symbol': symbol,
                 'side': side,
                 'type': 'market',
@@ -171,7 +495,7 @@ class CCXTClient:
         
         # Get position info if amount not specified
         if amount is None:
-            positions = self.exchange.fetch_positions([symbol])
+            positions = self._call('fetch_positions', lambda: self.exchange.fetch_positions([symbol]), hedge=True)
             position = next((p for p in positions if p['symbol'] == symbol), None)
             if position:
                 amount = abs(position['contracts'])
@@ -181,7 +505,8 @@ class CCXTClient:
             symbol=symbol,
             side=side,
             amount=amount,
-            params={'reduce_only': True}
+            params={**(params or {}), 'reduce_only': True},
+            resume=resume
         )
     
     def fetch_order(self, order_id: str, symbol: str) -> Dict[str, Any]:
@@ -203,7 +528,7 @@ class CCXTClient:
                 'info': {'test_mode': True}
             }
         
-        return self.exchange.fetch_order(order_id, symbol)
+        return self._call('fetch_order', lambda: self.exchange.fetch_order(order_id, symbol), hedge=True)
     
     def fetch_balance(self) -> Dict[str, Any]:
         """
@@ -219,7 +544,160 @@ class CCXTClient:
                     'used': 0.0,
                     'total': 10000.0
                 },
+                'free': {'USDT': 10000.0},
+                'used': {'USDT': 0.0},
+                'total': {'USDT': 10000.0},
                 'info': {'test_mode': True}
             }
         
-        return self.exchange.fetch_balance()
+        return self._call('fetch_balance', self.exchange.fetch_balance, hedge=True)
+    
+    def fetch_positions(self, symbols: Optional[list] = None) -> list:
+        """
+        Fetch open positions
+        
+        Args:
+            symbols: Restrict to these trading pairs (None for all)
+            
+        Returns:
+            List of positions
+        """
+        if self.test_mode:
+            return []
+        
+        return self._call('fetch_positions', lambda: self.exchange.fetch_positions(symbols), hedge=True)
+    
+    def fetch_ticker(self, symbol: str) -> Dict[str, Any]:
+        """
+        Fetch ticker
+        
+        Args:
+            symbol: Trading pair
+            
+        Returns:
+            Ticker information (public data, served in test mode too)
+        """
+        if self.market_data is not None:
+            return self.market_data.fetch_ticker(symbol)
+        
+        return self._call('fetch_ticker', lambda: self.exchange.fetch_ticker(symbol), hedge=True)
+    
+    def fetch_funding_rate(self, symbol: str) -> Dict[str, Any]:
+        """
+        Fetch current funding rate of a perpetual
+        
+        Args:
+            symbol: Trading pair
+            
+        Returns:
+            Funding rate information (public data, served in test mode too)
+        """
+        if self.market_data is not None:
+            return self.market_data.fetch_funding_rate(symbol)
+        
+        return self._call('fetch_funding_rate', lambda: self.exchange.fetch_funding_rate(symbol), hedge=True)
+    
+    def load_markets(self) -> Dict[str, Any]:
+        """
+        Load market definitions once, sharing the public client's copy
+        
+        Returns:
+            Markets keyed by symbol (empty in test mode)
+        """
+        if self.test_mode:
+            return {}
+        
+        if self.market_data is not None:
+            self.market_data.load_markets()
+            # Reference the shared dicts instead of fetching and storing a copy per account
+            for attribute in _MARKET_ATTRIBUTES:
+                setattr(self.exchange, attribute, getattr(self.market_data.exchange, attribute))
+            return self.exchange.markets
+        
+        if not self.exchange.markets:
+            self._call('load_markets', self.exchange.load_markets)
+        return self.exchange.markets
+
+
+# ccxt attributes populated by load_markets
+_MARKET_ATTRIBUTES = (
+    'markets', 'markets_by_id', 'symbols', 'ids',
+    'currencies', 'currencies_by_id', 'codes',
+)
+
+
+class ExchangeRegistry:
+    """
+    Creates and caches CCXT clients per exchange
+    
+    - One shared unauthenticated client per exchange serves public data
+    - Authenticated clients are built for APIKey.exchange, cached per API
+      key and rebuilt when the key record changes; credentials are only
+      decrypted when a client is built
+    """
+    
+    def __init__(self, test_mode: bool = True):
+        self.test_mode = test_mode
+        self._public: Dict[str, CCXTClient] = {}
+        self._clients: Dict[int, Any] = {}  # API key ID -> (updated_at, CCXTClient)
+        self._lock = threading.Lock()
+    
+    def public(self, exchange_id: str) -> CCXTClient:
+        """
+        Shared public market-data client for an exchange
+        
+        Args:
+            exchange_id: CCXT exchange ID
+            
+        Returns:
+            Unauthenticated CCXTClient
+        """
+        with self._lock:
+            client = self._public.get(exchange_id)
+            if client is None:
+                client = CCXTClient(test_mode=self.test_mode, exchange_id=exchange_id)
+                self._public[exchange_id] = client
+            return client
+    
+    def client_for(self, api_key_record) -> CCXTClient:
+        """
+        Authenticated client for an API key record
+        
+        Args:
+            api_key_record: APIKey row
+            
+        Returns:
+            CCXTClient for api_key_record.exchange
+        """
+        with self._lock:
+            cached = self._clients.get(api_key_record.id)
+        if cached and cached[0] == api_key_record.updated_at:
+            return cached[1]
+        
+        crypto_manager = get_crypto_manager()
+        client = CCXTClient(
+            api_key=crypto_manager.decrypt(api_key_record.api_key_enc, api_key_record.iv),
+            api_secret=crypto_manager.decrypt(api_key_record.api_secret_enc, api_key_record.iv),
+            test_mode=self.test_mode,
+            exchange_id=api_key_record.exchange,
+            market_data=self.public(api_key_record.exchange)
+        )
+        client.load_markets()
+        
+        with self._lock:
+            self._clients[api_key_record.id] = (api_key_record.updated_at, client)
+        return client
+
+
+# Singleton instance
+_exchange_registry = None
+
+
+def get_exchange_registry(test_mode: bool = True) -> ExchangeRegistry:
+    """Get or create ExchangeRegistry singleton (test_mode applies on creation)"""
+    global _exchange_registry
+    
+    if _exchange_registry is None:
+        _exchange_registry = ExchangeRegistry(test_mode=test_mode)
+    
+    return _exchange_registry
@@ -0,0 +1,141 @@
+"""
+In-memory subscription entitlement index
+Loaded once, refreshed incrementally from an updated_at watermark, and
+expired at expires_at through a timer heap, so gating a signal is a dict
+lookup that is also correct about expiry
+"""
+import os
+import time
+import heapq
+import threading
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from ..models import Subscription
+
+
+ENTITLEMENT_REFRESH_INTERVAL = float(os.getenv("ENTITLEMENT_REFRESH_INTERVAL", "5"))  # Seconds between incremental refreshes
+ENTITLEMENT_FULL_RELOAD_INTERVAL = float(os.getenv("ENTITLEMENT_FULL_RELOAD_INTERVAL", "300"))  # Seconds between full reloads
+# Seconds re-read behind the watermark: updated_at is set by app clocks before
+# commit, so a row can become visible after a newer one was already seen
+ENTITLEMENT_REFRESH_LAG = float(os.getenv("ENTITLEMENT_REFRESH_LAG", "60"))
+
+
+class EntitlementIndex:
+    """
+    Active subscriptions per user
+
+    A subscription entitles its user while status is "active" and
+    expires_at is null or in the future. Incremental refreshes pick up rows
+    whose updated_at is past the watermark minus ENTITLEMENT_REFRESH_LAG,
+    which covers clock skew between writers and rows committed late;
+    periodic full reloads catch deleted rows, changes made without bumping
+    updated_at and commits later than the lag.
+    """
+
+    def __init__(self):
+        self._by_user: Dict[int, Dict[int, Optional[datetime]]] = {}  # user_id -> {subscription_id: expires_at}
+        self._owners: Dict[int, int] = {}  # subscription_id -> user_id
+        self._expiry_heap: List[Tuple[datetime, int]] = []  # (expires_at, subscription_id)
+        self._watermark: Optional[datetime] = None
+        self._loaded = False
+        self._last_refresh = 0.0
+        self._last_full_reload = 0.0
+        self._lock = threading.Lock()
+
+    def _remove(self, subscription_id: int):
+        user_id = self._owners.pop(subscription_id, None)
+        if user_id is None:
+            return
+        subscriptions = self._by_user.get(user_id)
+        if subscriptions is not None:
+            subscriptions.pop(subscription_id, None)
+            if not subscriptions:
+                del self._by_user[user_id]
+
+    def _apply(self, subscription: Subscription, now: datetime):
+        """Insert, update or drop one subscription row"""
+        previous = self._by_user.get(self._owners.get(subscription.id), {}).get(subscription.id)
+        self._remove(subscription.id)
+
+        active = subscription.status == "active" and (
+            subscription.expires_at is None or subscription.expires_at > now
+        )
+        if active:
+            self._owners[subscription.id] = subscription.user_id
+            self._by_user.setdefault(subscription.user_id, {})[subscription.id] = subscription.expires_at
+            # Rows in the refresh lag are re-applied every refresh: push only changed expiries
+            if subscription.expires_at is not None and subscription.expires_at != previous:
+                heapq.heappush(self._expiry_heap, (subscription.expires_at, subscription.id))
+
+        if subscription.updated_at and (self._watermark is None or subscription.updated_at > self._watermark):
+            self._watermark = subscription.updated_at
+
+    def _expire(self, now: datetime):
+        """Drop subscriptions whose expires_at has passed"""
+        while self._expiry_heap and self._expiry_heap[0][0] <= now:
+            expires_at, subscription_id = heapq.heappop(self._expiry_heap)
+            user_id = self._owners.get(subscription_id)
+            # Skip stale heap entries left by updates to expires_at
+            if user_id is not None and self._by_user[user_id].get(subscription_id) == expires_at:
+                self._remove(subscription_id)
+
+    def load(self, db: Session):
+        """Rebuild the index from all active subscriptions"""
+        rows = db.query(Subscription).filter(Subscription.status == "active").all()
+        watermark = db.query(Subscription.updated_at).order_by(Subscription.updated_at.desc()).limit(1).scalar()
+        now = datetime.utcnow()
+
+        with self._lock:
+            self._by_user = {}
+            self._owners = {}
+            self._expiry_heap = []
+            self._watermark = watermark
+            for subscription in rows:
+                self._apply(subscription, now)
+            self._loaded = True
+            self._last_full_reload = self._last_refresh = time.monotonic()
+
+    def refresh(self, db: Session):
+        """Apply subscriptions changed since the watermark"""
+        query = db.query(Subscription)
+        if self._watermark is not None:
+            # Re-reading the lag window is idempotent and catches rows committed out of order
+            query = query.filter(Subscription.updated_at >= self._watermark - timedelta(seconds=ENTITLEMENT_REFRESH_LAG))
+        rows = query.all()
+        now = datetime.utcnow()
+
+        with self._lock:
+            for subscription in rows:
+                self._apply(subscription, now)
+            self._last_refresh = time.monotonic()
+
+    def maybe_refresh(self, db: Session):
+        """Full reload or incremental refresh when their interval has elapsed"""
+        now = time.monotonic()
+        if not self._loaded or now - self._last_full_reload >= ENTITLEMENT_FULL_RELOAD_INTERVAL:
+            self.load(db)
+        elif now - self._last_refresh >= ENTITLEMENT_REFRESH_INTERVAL:
+            self.refresh(db)
+
+    def is_entitled(self, user_id: int) -> bool:
+        """Whether the user has an active, unexpired subscription"""
+        with self._lock:
+            self._expire(datetime.utcnow())
+            return user_id in self._by_user
+
+
+# Singleton instance
+_entitlement_index = None
+
+
+def get_entitlement_index() -> EntitlementIndex:
+    """Get or create EntitlementIndex singleton"""
+    global _entitlement_index
+
+    if _entitlement_index is None:
+        _entitlement_index = EntitlementIndex()
+
+    return _entitlement_index
@@ -0,0 +1,312 @@
+"""
+Bounded-memory streaming export of signals and orders
+Rows are read through server-side cursors (yield_per) in keyset-ordered
+chunks, each chunk in its own short transaction, and written out as
+NDJSON, CSV or Parquet as they arrive
+
+Usage:
+    python -m app.services.export signals --format csv --output signals.csv
+    python -m app.services.export signals --format csv --output signals.csv --cursor <printed cursor>
+"""
+import io
+import os
+import sys
+import csv
+import json
+import argparse
+from datetime import datetime
+from typing import Optional, Iterator, Dict, Any, List, Tuple
+
+from sqlalchemy import select, tuple_
+from sqlalchemy import Integer, Float, String, Text, DateTime, Boolean
+
+from ..db import SessionLocal
+from ..models import Signal, Order
+from .history import encode_cursor, decode_cursor
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+
+EXPORT_CHUNK_SIZE = int(os.getenv("EXPORT_CHUNK_SIZE", "100000"))  # Rows per transaction
+EXPORT_FETCH_SIZE = int(os.getenv("EXPORT_FETCH_SIZE", "5000"))  # Rows per server-side cursor fetch
+
+# Exportable tables: model and keyset timestamp column
+EXPORT_TABLES = {
+    "signals": (Signal, Signal.received_at),
+    "orders": (Order, Order.created_at),
+}
+
+# Never exported (webhook tokens identify users)
+EXPORT_EXCLUDED_COLUMNS = {"token"}
+
+EXPORT_FORMATS = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+    "parquet": "application/vnd.apache.parquet",
+}
+
+
+def export_columns(table: str) -> list:
+    """Columns exported for a table, in table order"""
+    model, _ = EXPORT_TABLES[table]
+    return [column for column in model.__table__.columns if column.name not in EXPORT_EXCLUDED_COLUMNS]
+
+
+def iter_export_rows(
+    table: str,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    user_id: Optional[int] = None,
+    cursor: Optional[str] = None,
+    chunk_size: int = EXPORT_CHUNK_SIZE
+) -> Iterator[List[Dict[str, Any]]]:
+    """
+    Stream a table in ascending (timestamp, id) order, one batch at a time
+
+    Each chunk of chunk_size rows runs in its own session so no snapshot
+    or transaction stays open for the whole export; within a chunk rows
+    are fetched EXPORT_FETCH_SIZE at a time from a server-side cursor.
+
+    Args:
+        table: Key of EXPORT_TABLES
+        start: Inclusive lower bound on the timestamp column
+        end: Exclusive upper bound on the timestamp column
+        user_id: Restrict to one user
+        cursor: Resume after this position (see encode_cursor)
+        chunk_size: Rows per transaction
+
+    Yields:
+        Lists of row dicts (at most EXPORT_FETCH_SIZE each)
+    """
+    model, timestamp_column = EXPORT_TABLES[table]
+    columns = export_columns(table)
+    position = decode_cursor(cursor) if cursor else None
+
+    while True:
+        statement = select(*columns)
+        if start is not None:
+            statement = statement.where(timestamp_column >= start)
+        if end is not None:
+            statement = statement.where(timestamp_column < end)
+        if user_id is not None:
+            statement = statement.where(model.user_id == user_id)
+        if position is not None:
+            statement = statement.where(tuple_(timestamp_column, model.id) > position)
+        statement = statement.order_by(timestamp_column, model.id).limit(chunk_size)
+
+        db = SessionLocal()
+        fetched = 0
+        try:
+            result = db.execute(statement.execution_options(yield_per=EXPORT_FETCH_SIZE))
+            for partition in result.mappings().partitions():
+                rows = [dict(row) for row in partition]
+                fetched += len(rows)
+                position = (rows[-1][timestamp_column.key], rows[-1]["id"])
+                yield rows
+        finally:
+            db.close()
+
+        if fetched < chunk_size:
+            return
+
+
+def _json_value(value: Any) -> Any:
+    return value.isoformat() if isinstance(value, datetime) else value
+
+
+def _arrow_schema(table: str):
+    """Parquet schema derived from the SQLAlchemy column types"""
+    fields = []
+    for column in export_columns(table):
+        if isinstance(column.type, Boolean):
+            arrow_type = pa.bool_()
+        elif isinstance(column.type, Integer):
+            arrow_type = pa.int64()
+        elif isinstance(column.type, Float):
+            arrow_type = pa.float64()
+        elif isinstance(column.type, DateTime):
+            arrow_type = pa.timestamp("us")
+        elif isinstance(column.type, (String, Text)):
+            arrow_type = pa.string()
+        else:
+            arrow_type = pa.string()
+        fields.append(pa.field(column.name, arrow_type))
+    return pa.schema(fields)
+
+
+class _ChunkSink(io.RawIOBase):
+    """Write-only stream that hands written bytes back out in pieces"""
+
+    def __init__(self):
+        self._buffer = bytearray()
+        self._position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self._buffer += data
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def drain(self) -> bytes:
+        data = bytes(self._buffer)
+        self._buffer.clear()
+        return data
+
+
+def stream_export_batches(
+    table: str,
+    export_format: str = "ndjson",
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    user_id: Optional[int] = None,
+    cursor: Optional[str] = None
+) -> Iterator[Tuple[bytes, int, Optional[str]]]:
+    """
+    Encode an export as a stream of byte chunks with their resume position
+
+    A resumed export (cursor given) continues the earlier output, so CSV
+    gets no header row. Parquet pieces only form a readable file once the
+    last one is written, hence only the last piece carries a cursor.
+
+    Args:
+        table: Key of EXPORT_TABLES
+        export_format: Key of EXPORT_FORMATS
+        start, end, user_id, cursor: See iter_export_rows
+
+    Returns:
+        Iterator of (data, rows_written, resume_cursor), one per fetched
+        batch; resume_cursor is valid once data and everything before it
+        are written out, and is None for pieces that end no batch
+
+    Raises:
+        ValueError: On an unknown table or format, a malformed cursor, or
+            Parquet without pyarrow (checked before any row is read)
+    """
+    if table not in EXPORT_TABLES:
+        raise ValueError(f"Unknown table: {table}")
+    if export_format not in EXPORT_FORMATS:
+        raise ValueError(f"Unknown format: {export_format}")
+    if export_format == "parquet" and pa is None:
+        raise ValueError("pyarrow library not installed. Install with: pip install pyarrow")
+    if cursor:
+        decode_cursor(cursor)
+
+    return _encode(table, export_format, iter_export_rows(table, start, end, user_id, cursor), header=not cursor)
+
+
+def stream_export(
+    table: str,
+    export_format: str = "ndjson",
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    user_id: Optional[int] = None,
+    cursor: Optional[str] = None
+) -> Iterator[bytes]:
+    """
+    Encode an export as a stream of byte chunks
+
+    Same arguments and validation as stream_export_batches, without the
+    resume positions.
+    """
+    batches = stream_export_batches(table, export_format, start, end, user_id, cursor)
+    return (data for data, _, _ in batches)
+
+
+def _encode(table: str, export_format: str, rows_iter, header: bool) -> Iterator[Tuple[bytes, int, Optional[str]]]:
+    _, timestamp_column = EXPORT_TABLES[table]
+    names = [column.name for column in export_columns(table)]
+    written = 0
+    resume_cursor = None
+
+    if export_format == "parquet":
+        sink = _ChunkSink()
+        writer = pq.ParquetWriter(sink, _arrow_schema(table))
+        for rows in rows_iter:
+            writer.write_table(pa.Table.from_pylist(rows, schema=writer.schema))
+            written += len(rows)
+            resume_cursor = encode_cursor(rows[-1][timestamp_column.key], rows[-1]["id"])
+            yield sink.drain(), written, None
+        writer.close()
+        yield sink.drain(), written, resume_cursor
+        return
+
+    if export_format == "csv":
+        buffer = io.StringIO()
+        csv_writer = csv.DictWriter(buffer, fieldnames=names)
+        if header:
+            csv_writer.writeheader()
+            yield buffer.getvalue().encode(), written, None
+
+    for rows in rows_iter:
+        if export_format == "csv":
+            buffer.seek(0)
+            buffer.truncate()
+            csv_writer.writerows({name: _json_value(value) for name, value in row.items()} for row in rows)
+            data = buffer.getvalue()
+        else:
+            data = "".join(
+                json.dumps({name: _json_value(value) for name, value in row.items()}) + "\n"
+                for row in rows
+            )
+        written += len(rows)
+        yield data.encode(), written, encode_cursor(rows[-1][timestamp_column.key], rows[-1]["id"])
+
+
+def main(argv: Optional[List[str]] = None):
+    """
+    Command-line export; progress and the resume cursor go to stderr
+
+    A cursor is printed only once the rows before it are flushed to the
+    output. With --cursor, NDJSON and CSV are appended to --output; a
+    Parquet file cannot be extended, so a resumed Parquet export needs a
+    new output file.
+    """
+    parser = argparse.ArgumentParser(description="Export HUMBEX signals or orders")
+    parser.add_argument("table", choices=sorted(EXPORT_TABLES))
+    parser.add_argument("--format", dest="export_format", choices=sorted(EXPORT_FORMATS), default="ndjson")
+    parser.add_argument("--output", "-o", help="Output file (default: stdout); appended to when resuming")
+    parser.add_argument("--start", type=datetime.fromisoformat, help="Inclusive start (ISO 8601, UTC)")
+    parser.add_argument("--end", type=datetime.fromisoformat, help="Exclusive end (ISO 8601, UTC)")
+    parser.add_argument("--user-id", type=int)
+    parser.add_argument("--cursor", help="Resume after this cursor (printed during a previous export)")
+    args = parser.parse_args(argv)
+
+    append = bool(args.cursor and args.output)
+    if append and args.export_format == "parquet" and os.path.exists(args.output):
+        parser.error("a Parquet file cannot be appended to: resume into a new --output file")
+
+    batches = stream_export_batches(
+        args.table,
+        args.export_format,
+        start=args.start,
+        end=args.end,
+        user_id=args.user_id,
+        cursor=args.cursor
+    )
+    output = open(args.output, "ab" if append else "wb") if args.output else sys.stdout.buffer
+    try:
+        for data, rows_written, resume_cursor in batches:
+            output.write(data)
+            output.flush()
+            if resume_cursor is None:
+                continue
+            if args.output:
+                os.fsync(output.fileno())
+            print(f"{rows_written} rows, resume with --cursor {resume_cursor}", file=sys.stderr, flush=True)
+    finally:
+        if args.output:
+            output.close()
+
+
+if __name__ == "__main__":
+    main()
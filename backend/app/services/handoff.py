@@ -0,0 +1,196 @@
+"""
+In-process signal hand-off for single-node (co-located) deployments
+The webhook appends each accepted signal to an fsync'd journal and puts it
+on an asyncio queue consumed by the execution engine in the same process;
+the Postgres signals row is written by the engine, off the request path.
+Unacknowledged journal entries are replayed on restart.
+"""
+import os
+import json
+import uuid
+import asyncio
+import logging
+import threading
+from datetime import datetime
+from typing import Callable, Dict, Any, List, Optional
+
+
+JOURNAL_PATH = os.getenv("JOURNAL_PATH", "data/signals.journal")
+HANDOFF_RETRY_DELAY = float(os.getenv("HANDOFF_RETRY_DELAY", "5"))  # Seconds before retrying a failed record
+HANDOFF_MAX_ATTEMPTS = int(os.getenv("HANDOFF_MAX_ATTEMPTS", "5"))  # Handler runs per record before it is left for replay
+JOURNAL_COMPACT_EVERY = int(os.getenv("JOURNAL_COMPACT_EVERY", "10000"))  # Acks between journal compactions
+
+logger = logging.getLogger("humbex.handoff")
+
+
+class SignalJournal:
+    """
+    Append-only JSON-lines journal of accepted signals
+    
+    Each signal is written as {"record": {...}} and fsync'd before the
+    webhook answers. Once the engine has persisted it, {"ack": journal_id}
+    is appended. On startup, records without an ack are replayed. The
+    unacknowledged records are also tracked in memory so the file can be
+    compacted down to them at any time.
+    """
+    
+    def __init__(self, path: str = JOURNAL_PATH):
+        self.path = path
+        self.acked_since_compact = 0
+        self._pending: Dict[str, Dict[str, Any]] = {}  # journal_id -> record, in journal order
+        self._lock = threading.Lock()
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._file = open(path, "a", encoding="utf-8")
+    
+    def append(self, record: Dict[str, Any]):
+        """Durably append a signal record (blocks until fsync'd)"""
+        line = json.dumps({"record": record}) + "\n"
+        with self._lock:
+            self._file.write(line)
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._pending[record["journal_id"]] = record
+    
+    def ack(self, journal_id: str):
+        """
+        Mark a record as persisted
+        
+        Not fsync'd: a lost ack only causes a replay, which the engine
+        detects through the signal's journal_id.
+        """
+        with self._lock:
+            self._file.write(json.dumps({"ack": journal_id}) + "\n")
+            self._file.flush()
+            self._pending.pop(journal_id, None)
+            self.acked_since_compact += 1
+    
+    def unacknowledged(self) -> List[Dict[str, Any]]:
+        """Read the file and return the records without an ack, in journal order"""
+        records: Dict[str, Dict[str, Any]] = {}
+        with self._lock, open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    # Torn write from a crash mid-append: the webhook never answered
+                    continue
+                if "record" in entry:
+                    records[entry["record"]["journal_id"]] = entry["record"]
+                elif "ack" in entry:
+                    records.pop(entry["ack"], None)
+            self._pending = dict(records)
+        return list(records.values())
+    
+    def compact(self):
+        """Atomically rewrite the journal with only the unacknowledged records"""
+        tmp_path = f"{self.path}.tmp"
+        with self._lock:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                for record in self._pending.values():
+                    f.write(json.dumps({"record": record}) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+            self._file.close()
+            os.replace(tmp_path, self.path)
+            directory = os.open(os.path.dirname(os.path.abspath(self.path)), os.O_RDONLY)
+            try:
+                os.fsync(directory)
+            finally:
+                os.close(directory)
+            self._file = open(self.path, "a", encoding="utf-8")
+            self.acked_since_compact = 0
+    
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+
+class InProcessHandoff:
+    """
+    Journal + asyncio queue between the webhook and the execution engine
+
+    The handler is a blocking callable handler(record, replayed) run in a
+    thread; records are consumed one at a time, in arrival order. A record
+    whose handler raises is retried in place (holding back the records
+    behind it, so order is kept) every HANDOFF_RETRY_DELAY, up to
+    HANDOFF_MAX_ATTEMPTS runs; after that it stays unacknowledged in the
+    journal, to be replayed on the next start, and consumption moves on.
+    The journal is compacted every JOURNAL_COMPACT_EVERY acks.
+    """
+
+    def __init__(self, journal: SignalJournal, handler: Callable[[Dict[str, Any], bool], None]):
+        self.journal = journal
+        self.handler = handler
+        self.queue: Optional[asyncio.Queue] = None
+        self._consumer: Optional[asyncio.Task] = None
+
+    async def start(self):
+        """Replay unacknowledged records, then start consuming"""
+        self.queue = asyncio.Queue()
+
+        pending = await asyncio.to_thread(self.journal.unacknowledged)
+        await asyncio.to_thread(self.journal.compact)
+        for record in pending:
+            self.queue.put_nowait((record, True))
+
+        self._consumer = asyncio.create_task(self._consume())
+
+    async def stop(self):
+        """Stop consuming; queued records stay in the journal for replay"""
+        if self._consumer is not None:
+            self._consumer.cancel()
+            try:
+                await self._consumer
+            except asyncio.CancelledError:
+                pass
+        self.journal.close()
+
+    async def submit(
+        self,
+        token: str,
+        action: str,
+        symbol: str,
+        quantity: Optional[float],
+        price: Optional[float]
+    ) -> Dict[str, Any]:
+        """
+        Journal a signal and queue it for execution
+
+        Returns:
+            The journaled record (with journal_id and received_at)
+        """
+        record = {
+            "journal_id": str(uuid.uuid4()),
+            "token": token,
+            "action": action,
+            "symbol": symbol,
+            "quantity": quantity,
+            "price": price,
+            "received_at": datetime.utcnow().isoformat(),
+        }
+        await asyncio.to_thread(self.journal.append, record)
+        self.queue.put_nowait((record, False))
+        return record
+
+    async def _consume(self):
+        while True:
+            record, replayed = await self.queue.get()
+            for attempt in range(1, HANDOFF_MAX_ATTEMPTS + 1):
+                try:
+                    # After a failure the row may or may not have been written: retry as a replay
+                    await asyncio.to_thread(self.handler, record, replayed or attempt > 1)
+                except Exception:
+                    if attempt < HANDOFF_MAX_ATTEMPTS:
+                        await asyncio.sleep(HANDOFF_RETRY_DELAY)
+                    continue
+                self.journal.ack(record["journal_id"])
+                break
+            else:
+                logger.error(
+                    f"Signal {record['journal_id']} failed {HANDOFF_MAX_ATTEMPTS} times, left for replay on restart",
+                    extra={"journal_id": record["journal_id"]}
+                )
+            
+            if self.journal.acked_since_compact >= JOURNAL_COMPACT_EVERY:
+                await asyncio.to_thread(self.journal.compact)
@@ -0,0 +1,128 @@
+"""
+Keyset pagination over signal and order history
+Pages are ordered newest first on (timestamp, id), so each page is an index
+range scan no matter how deep the client has paged
+"""
+import base64
+from datetime import datetime
+from typing import Optional, Tuple, List, Dict, Any
+
+from sqlalchemy import tuple_
+from sqlalchemy.orm import Query
+
+from ..models import Signal, Order
+
+
+MAX_PAGE_SIZE = 500
+
+
+def encode_cursor(timestamp: datetime, row_id: int) -> str:
+    """
+    Encode a keyset position as an opaque cursor
+
+    Args:
+        timestamp: Sort timestamp of the last row returned
+        row_id: ID of the last row returned
+
+    Returns:
+        URL-safe cursor string
+    """
+    raw = f"{timestamp.isoformat()}|{row_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    """
+    Decode a cursor produced by encode_cursor
+
+    Args:
+        cursor: Cursor string
+
+    Returns:
+        Tuple of (timestamp, row_id)
+
+    Raises:
+        ValueError: If the cursor is malformed
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        timestamp, row_id = base64.urlsafe_b64decode(padded.encode()).decode().split("|")
+        return datetime.fromisoformat(timestamp), int(row_id)
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+
+def paginate(
+    query: Query,
+    timestamp_column,
+    id_column,
+    cursor: Optional[str] = None,
+    limit: int = 50
+) -> Tuple[List[Any], Optional[str]]:
+    """
+    Fetch one page of a query, newest first, using keyset pagination
+
+    Args:
+        query: Base query (already filtered)
+        timestamp_column: Column to sort on (e.g. Signal.received_at)
+        id_column: Primary key column used as tie-breaker
+        cursor: Cursor returned by the previous page, if any
+        limit: Page size (capped at MAX_PAGE_SIZE)
+
+    Returns:
+        Tuple of (rows, next_cursor); next_cursor is None on the last page
+    """
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+
+    if cursor:
+        timestamp, row_id = decode_cursor(cursor)
+        query = query.filter(tuple_(timestamp_column, id_column) < (timestamp, row_id))
+
+    # Fetch one extra row to know whether another page exists
+    rows = query.order_by(timestamp_column.desc(), id_column.desc()).limit(limit + 1).all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = encode_cursor(getattr(last, timestamp_column.key), last.id)
+
+    return rows, next_cursor
+
+
+def signal_to_dict(signal: Signal) -> Dict[str, Any]:
+    """Serialize a Signal row for the API"""
+    return {
+        "id": signal.id,
+        "user_id": signal.user_id,
+        "action": signal.action,
+        "symbol": signal.symbol,
+        "quantity": signal.quantity,
+        "price": signal.price,
+        "status": signal.status,
+        "error_message": signal.error_message,
+        "received_at": signal.received_at.isoformat() if signal.received_at else None,
+        "processed_at": signal.processed_at.isoformat() if signal.processed_at else None,
+    }
+
+
+def order_to_dict(order: Order) -> Dict[str, Any]:
+    """Serialize an Order row for the API"""
+    return {
+        "id": order.id,
+        "signal_id": order.signal_id,
+        "user_id": order.user_id,
+        "exchange": order.exchange,
+        "order_id": order.order_id,
+        "symbol": order.symbol,
+        "side": order.side,
+        "order_type": order.order_type,
+        "quantity": order.quantity,
+        "price": order.price,
+        "filled_quantity": order.filled_quantity,
+        "average_price": order.average_price,
+        "status": order.status,
+        "test_mode": order.test_mode,
+        "error_message": order.error_message,
+        "created_at": order.created_at.isoformat() if order.created_at else None,
+    }
@@ -0,0 +1,323 @@
+"""
+On-demand sampling profiler and slow-signal flight recorder
+Both are idle until used: the profiler only runs while toggled on, and the
+flight recorder only keeps signals slower than FLIGHT_RECORDER_THRESHOLD_MS
+"""
+import os
+import sys
+import json
+import time
+import logging
+import threading
+import contextvars
+from collections import deque, Counter
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Optional, Dict, Any, List
+
+
+PROFILE_DIR = os.getenv("PROFILE_DIR", "/tmp/humbex")
+PROFILER_INTERVAL = float(os.getenv("PROFILER_INTERVAL", "0.005"))  # Seconds between samples
+FLIGHT_RECORDER_SIZE = int(os.getenv("FLIGHT_RECORDER_SIZE", "100"))
+FLIGHT_RECORDER_THRESHOLD_MS = float(os.getenv("FLIGHT_RECORDER_THRESHOLD_MS", "500"))
+FLIGHT_RECORDER_DUMP_MS = float(os.getenv("FLIGHT_RECORDER_DUMP_MS", "5000"))
+FLIGHT_RECORDER_DUMP_INTERVAL = 60.0  # Minimum seconds between automatic dumps
+
+logger = logging.getLogger("humbex.profiling")
+
+
+class SamplingProfiler:
+    """
+    Wall-clock sampling profiler
+
+    A background thread snapshots every thread's stack at a fixed interval
+    and counts identical stacks. The report is in collapsed-stack format
+    (one "frame;frame;frame count" line per stack), ready for flamegraph tools.
+    """
+
+    def __init__(self, interval: float = PROFILER_INTERVAL):
+        self.interval = interval
+        self.samples: Counter = Counter()
+        self.sample_count = 0
+        self.started_at: Optional[float] = None
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self) -> bool:
+        """
+        Start sampling
+
+        Returns:
+            False if the profiler was already running
+        """
+        with self._lock:
+            if self.running:
+                return False
+            self.samples = Counter()
+            self.sample_count = 0
+            self.started_at = time.monotonic()
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="humbex-profiler", daemon=True)
+            self._thread.start()
+            return True
+
+    def stop(self) -> Dict[str, Any]:
+        """
+        Stop sampling
+
+        Returns:
+            Profile report (see report())
+        """
+        with self._lock:
+            if self._thread is not None:
+                self._stop.set()
+                self._thread.join()
+                self._thread = None
+        return self.report()
+
+    def toggle(self) -> Optional[Dict[str, Any]]:
+        """Start if stopped; stop and return the report if running"""
+        if self.running:
+            return self.stop()
+        self.start()
+        return None
+
+    def _run(self):
+        own_id = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+                    frame = frame.f_back
+                self.samples[";".join(reversed(stack))] += 1
+            self.sample_count += 1
+
+    def report(self, top: int = 50) -> Dict[str, Any]:
+        """
+        Summarize collected samples
+
+        Args:
+            top: Number of hottest stacks to include
+
+        Returns:
+            Dict with sample totals and the hottest collapsed stacks
+        """
+        samples = self.samples.copy()
+        return {
+            'running': self.running,
+            'interval': self.interval,
+            'samples': self.sample_count,
+            'duration': time.monotonic() - self.started_at if self.started_at else 0.0,
+            'top_stacks': [
+                {'stack': stack, 'count': count}
+                for stack, count in samples.most_common(top)
+            ],
+        }
+
+    def dump(self, path: Optional[str] = None) -> str:
+        """
+        Write all collected stacks in collapsed-stack format
+
+        Returns:
+            Path of the written file
+        """
+        path = path or os.path.join(PROFILE_DIR, f"profile-{os.getpid()}-{int(time.time())}.folded")
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as f:
+            for stack, count in self.samples.copy().items():
+                f.write(f"{stack} {count}\n")
+        return path
+
+
+class SignalTrace:
+    """
+    Timing and call counts for one process_signal execution
+
+    Stages are timed lap-style: trace.lap("name") attributes the time since
+    the previous lap (or the start) to that stage. DB statements and
+    exchange calls made while the trace is current are counted through
+    count_db_call() / count_exchange_call().
+    """
+
+    def __init__(self, signal_id: Any):
+        self.signal_id = signal_id
+        self.started_at = datetime.utcnow()
+        self.stages: Dict[str, float] = {}
+        self.db_calls = 0
+        self.exchange_calls = 0
+        self.outcome: Optional[str] = None
+        self.total_ms = 0.0
+        self._start = time.perf_counter()
+        self._last_lap = self._start
+
+    def lap(self, name: str):
+        """Attribute the time since the previous lap to a stage"""
+        now = time.perf_counter()
+        self.stages[name] = self.stages.get(name, 0.0) + (now - self._last_lap) * 1000
+        self._last_lap = now
+
+    def finish(self, outcome: Optional[str] = None):
+        self.total_ms = (time.perf_counter() - self._start) * 1000
+        self.outcome = outcome
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'signal_id': self.signal_id,
+            'started_at': self.started_at.isoformat(),
+            'total_ms': round(self.total_ms, 3),
+            'stages_ms': {name: round(ms, 3) for name, ms in self.stages.items()},
+            'db_calls': self.db_calls,
+            'exchange_calls': self.exchange_calls,
+            'outcome': self.outcome,
+        }
+
+
+_current_trace: contextvars.ContextVar = contextvars.ContextVar("humbex_signal_trace", default=None)
+
+
+@contextmanager
+def trace_signal(signal_id: Any):
+    """
+    Trace a process_signal execution and hand it to the flight recorder
+
+    Usage:
+        with trace_signal(signal.id) as trace:
+            user = get_user_by_token(db, signal.token)
+            trace.lap("lookup_user")
+    """
+    trace = SignalTrace(signal_id)
+    token = _current_trace.set(trace)
+    try:
+        yield trace
+    finally:
+        _current_trace.reset(token)
+        trace.finish(trace.outcome)
+        get_flight_recorder().observe(trace)
+
+
+def count_db_call():
+    """Count a DB statement against the current trace, if any"""
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.db_calls += 1
+
+
+def count_exchange_call():
+    """Count an exchange request against the current trace, if any"""
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.exchange_calls += 1
+
+
+def instrument_engine(engine):
+    """Count every statement executed on an engine against the current trace"""
+    from sqlalchemy import event
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _count(conn, cursor, statement, parameters, context, executemany):
+        count_db_call()
+
+
+class FlightRecorder:
+    """
+    Ring buffer of the last slow process_signal executions
+
+    Traces at or above threshold_ms are kept (oldest evicted first). A trace
+    at or above dump_ms triggers an automatic dump, at most once per
+    FLIGHT_RECORDER_DUMP_INTERVAL.
+    """
+
+    def __init__(
+        self,
+        size: int = FLIGHT_RECORDER_SIZE,
+        threshold_ms: float = FLIGHT_RECORDER_THRESHOLD_MS,
+        dump_ms: float = FLIGHT_RECORDER_DUMP_MS
+    ):
+        self.entries: deque = deque(maxlen=size)
+        self.threshold_ms = threshold_ms
+        self.dump_ms = dump_ms
+        self.observed = 0
+        self._last_dump = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, trace: SignalTrace) -> Optional[str]:
+        """
+        Record a finished trace if it is slow
+
+        Returns:
+            Path of the automatic dump, if one was written (dump errors are logged)
+        """
+        with self._lock:
+            self.observed += 1
+            if trace.total_ms < self.threshold_ms:
+                return None
+            self.entries.append(trace.to_dict())
+
+            should_dump = (
+                trace.total_ms >= self.dump_ms
+                and time.monotonic() - self._last_dump >= FLIGHT_RECORDER_DUMP_INTERVAL
+            )
+            if should_dump:
+                self._last_dump = time.monotonic()
+
+        if not should_dump:
+            return None
+        try:
+            return self.dump()
+        except Exception as e:
+            # Runs in trace_signal's finally: never fail the traced signal over diagnostics
+            logger.error(f"Flight recorder dump failed: {str(e)}")
+            return None
+
+    def snapshot(self) -> List[Dict[str, Any]]:
+        """Recorded traces, oldest first"""
+        with self._lock:
+            return list(self.entries)
+
+    def dump(self, path: Optional[str] = None) -> str:
+        """
+        Write recorded traces as JSON lines
+
+        Returns:
+            Path of the written file
+        """
+        path = path or os.path.join(PROFILE_DIR, f"flight-{os.getpid()}-{int(time.time())}.jsonl")
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as f:
+            for entry in self.snapshot():
+                f.write(json.dumps(entry) + "\n")
+        return path
+
+
+# Singleton instances (one per process)
+_profiler = None
+_flight_recorder = None
+
+
+def get_profiler() -> SamplingProfiler:
+    """Get or create SamplingProfiler singleton"""
+    global _profiler
+
+    if _profiler is None:
+        _profiler = SamplingProfiler()
+
+    return _profiler
+
+
+def get_flight_recorder() -> FlightRecorder:
+    """Get or create FlightRecorder singleton"""
+    global _flight_recorder
+
+    if _flight_recorder is None:
+        _flight_recorder = FlightRecorder()
+
+    return _flight_recorder
@@ -0,0 +1,329 @@
+"""
+Pre-trade risk and position sizing
+Balances, exposure and prices come from per-account / per-symbol TTL caches,
+so the exchange is queried once per TTL instead of once per signal (cache
+misses of a batch are fetched concurrently), and sizing plus limit checks run as NumPy array operations over a whole batch
+"""
+import os
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Dict, Any, List, Tuple, Hashable
+
+import numpy as np
+
+
+RISK_BALANCE_TTL = float(os.getenv("RISK_BALANCE_TTL", "30"))  # Seconds
+RISK_TICKER_TTL = float(os.getenv("RISK_TICKER_TTL", "2"))  # Seconds
+RISK_DEFAULT_MAX_LEVERAGE = float(os.getenv("RISK_DEFAULT_MAX_LEVERAGE", "10"))
+RISK_DEFAULT_MAX_NOTIONAL = float(os.getenv("RISK_DEFAULT_MAX_NOTIONAL", "inf"))
+RISK_FETCH_CONCURRENCY = int(os.getenv("RISK_FETCH_CONCURRENCY", "16"))  # Parallel exchange reads when warming caches
+
+# Threads used to load missing snapshots and prices concurrently
+_fetch_executor: Optional[ThreadPoolExecutor] = None
+
+
+def _get_fetch_executor() -> ThreadPoolExecutor:
+    """Get or create the cache warming thread pool"""
+    global _fetch_executor
+
+    if _fetch_executor is None:
+        _fetch_executor = ThreadPoolExecutor(max_workers=RISK_FETCH_CONCURRENCY, thread_name_prefix="risk-fetch")
+
+    return _fetch_executor
+
+
+class TTLCache:
+    """Thread-safe dict whose entries expire after ttl seconds"""
+
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        self._entries: Dict[Hashable, Any] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if time.monotonic() >= expires_at:
+                del self._entries[key]
+                return None
+            return value
+
+    def set(self, key: Hashable, value: Any):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+
+    def invalidate(self, key: Hashable):
+        with self._lock:
+            self._entries.pop(key, None)
+
+
+class AccountSnapshot:
+    """Cached equity and open exposure of one exchange account"""
+
+    def __init__(self, balance_total: Dict[str, float], exposure: float):
+        self.balance_total = balance_total  # Total balance per currency
+        self.exposure = exposure  # Sum of open position notionals
+
+    def equity(self, currency: str) -> float:
+        return float(self.balance_total.get(currency) or 0.0)
+
+
+class RiskRequest:
+    """Inputs of one pre-trade check"""
+
+    def __init__(
+        self,
+        equity: float,
+        exposure: float,
+        quantity: Optional[float],
+        price: Optional[float],
+        closing: bool = False,
+        equity_fraction: Optional[float] = None,
+        max_leverage: Optional[float] = None,
+        max_notional: Optional[float] = None,
+        account: Optional[Hashable] = None
+    ):
+        self.equity = equity
+        self.exposure = exposure
+        self.quantity = quantity
+        self.price = price
+        self.closing = closing
+        self.equity_fraction = equity_fraction
+        self.max_leverage = max_leverage
+        self.max_notional = max_notional
+        self.account = account  # Requests sharing an account share its exposure headroom
+
+
+class RiskDecision:
+    """Outcome of a pre-trade check"""
+
+    def __init__(self, allowed: bool, quantity: Optional[float], reason: Optional[str] = None, reduced: bool = False):
+        self.allowed = allowed
+        self.quantity = quantity  # Quantity to send (None: close full position)
+        self.reason = reason
+        self.reduced = reduced  # True if the quantity was cut down by a limit
+
+    def __repr__(self):
+        return f"RiskDecision(allowed={self.allowed}, quantity={self.quantity}, reason={self.reason!r})"
+
+
+def _column(values: List[Optional[float]], default: float) -> np.ndarray:
+    """Float array with None replaced by default"""
+    return np.array([default if value is None else value for value in values], dtype=np.float64)
+
+
+def _prior_in_group(values: np.ndarray, groups: np.ndarray) -> np.ndarray:
+    """Sum of the values of earlier elements in the same group (exclusive cumulative sum per group)"""
+    order = np.argsort(groups, kind="stable")
+    sorted_values = values[order]
+    sorted_groups = groups[order]
+    exclusive = np.cumsum(sorted_values) - sorted_values
+    starts = np.r_[True, sorted_groups[1:] != sorted_groups[:-1]]
+    group_start = np.maximum.accumulate(np.where(starts, np.arange(len(values)), 0))
+    prior = np.empty_like(values)
+    prior[order] = exclusive - exclusive[group_start]
+    return prior
+
+
+def evaluate_batch(requests: List[RiskRequest]) -> List[RiskDecision]:
+    """
+    Size and limit-check a batch of orders at once
+
+    Sizing: with an equity_fraction and a known price, quantity is
+    equity * fraction / price; otherwise the requested quantity (default 1.0).
+    Limits: order notional is capped by max_notional and by the leverage
+    headroom (equity * max_leverage - exposure). Within the batch, orders
+    for the same account are applied in sequence: each one's headroom is
+    reduced by the notional of the earlier ones. Orders cut to zero are
+    rejected. Closing orders reduce risk and are never limited. Without a
+    price, notional limits cannot be evaluated and the quantity passes as is.
+
+    Args:
+        requests: One RiskRequest per order
+
+    Returns:
+        One RiskDecision per request, in the same order
+    """
+    if not requests:
+        return []
+
+    equity = _column([r.equity for r in requests], 0.0)
+    exposure = _column([r.exposure for r in requests], 0.0)
+    requested = _column([r.quantity for r in requests], np.nan)
+    price = _column([r.price if r.price and r.price > 0 else None for r in requests], np.nan)
+    fraction = _column([r.equity_fraction for r in requests], np.nan)
+    max_leverage = _column([r.max_leverage for r in requests], RISK_DEFAULT_MAX_LEVERAGE)
+    max_notional = _column([r.max_notional for r in requests], RISK_DEFAULT_MAX_NOTIONAL)
+    closing = np.array([r.closing for r in requests], dtype=bool)
+
+    has_price = ~np.isnan(price)
+    by_fraction = ~np.isnan(fraction)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        sized = np.where(
+            by_fraction & has_price,
+            equity * fraction / price,
+            np.where(np.isnan(requested), 1.0, requested)
+        )
+        # Notional each order will add once filled (only the per-order cap applies here:
+        # an order cut by the headroom leaves none to the next, whatever is counted for it)
+        order_notional = np.where(has_price & ~closing, np.minimum(sized * price, max_notional), 0.0)
+        accounts = {}
+        groups = np.array([
+            accounts.setdefault(i if r.account is None else ("account", r.account), len(accounts))
+            for i, r in enumerate(requests)
+        ])
+        prior = _prior_in_group(order_notional, groups)
+        headroom = np.maximum(equity * max_leverage - exposure - prior, 0.0)
+        cap_notional = np.minimum(max_notional, headroom)
+        capped = np.where(has_price, np.minimum(sized, cap_notional / price), sized)
+
+    no_price_for_sizing = by_fraction & ~has_price & ~closing
+    no_equity = (equity <= 0) & ~closing
+    limited_out = (capped <= 0) & ~closing
+    reduced = (capped < sized) & ~closing
+
+    decisions = []
+    for i, request in enumerate(requests):
+        if closing[i]:
+            decisions.append(RiskDecision(True, request.quantity))
+        elif no_price_for_sizing[i]:
+            decisions.append(RiskDecision(False, None, "No price available for sizing"))
+        elif no_equity[i]:
+            decisions.append(RiskDecision(False, None, "No equity available"))
+        elif limited_out[i]:
+            decisions.append(RiskDecision(False, None, "Exposure limit reached"))
+        else:
+            decisions.append(RiskDecision(True, float(capped[i]), reduced=bool(reduced[i])))
+
+    return decisions
+
+
+class RiskEngine:
+    """
+    Caches account snapshots and prices for pre-trade checks
+
+    Snapshots are keyed by account (API key ID) and refreshed through the
+    account's CCXTClient at most once per RISK_BALANCE_TTL; exposure is
+    bumped locally after each fill so consecutive orders see it before the
+    next refresh.
+    """
+
+    def __init__(self, balance_ttl: float = RISK_BALANCE_TTL, ticker_ttl: float = RISK_TICKER_TTL):
+        self.snapshots = TTLCache(balance_ttl)
+        self.prices = TTLCache(ticker_ttl)
+
+    def snapshot(self, account_id: Hashable, client) -> AccountSnapshot:
+        """
+        Cached balance and exposure for an account
+
+        Args:
+            account_id: Cache key (API key ID)
+            client: CCXTClient used on cache miss
+
+        Returns:
+            AccountSnapshot
+        """
+        snapshot = self.snapshots.get(account_id)
+        if snapshot is None:
+            snapshot = self._store_snapshot(account_id, client.fetch_balance(), client.fetch_positions())
+        return snapshot
+
+    def _store_snapshot(self, account_id: Hashable, balance: Dict[str, Any], positions: list) -> AccountSnapshot:
+        exposure = sum(abs(p.get('notional') or 0.0) for p in positions)
+        snapshot = AccountSnapshot(dict(balance.get('total') or {}), exposure)
+        self.snapshots.set(account_id, snapshot)
+        return snapshot
+
+    def price(self, symbol: str, client) -> Optional[float]:
+        """
+        Cached last price for a symbol on the client's exchange
+
+        Args:
+            symbol: CCXT symbol (e.g. 'AVAX/USDT:USDT')
+            client: CCXTClient used on cache miss
+
+        Returns:
+            Last price, or None if unavailable
+        """
+        key = (client.exchange.id, symbol)
+        price = self.prices.get(key)
+        if price is None:
+            price = client.fetch_ticker(symbol).get('last')
+            if price:
+                self.prices.set(key, price)
+        return price
+
+    def warm(
+        self,
+        accounts: Dict[Hashable, Any],
+        symbols: List[Tuple[str, Any]]
+    ) -> Dict[Hashable, Exception]:
+        """
+        Load every missing snapshot and price concurrently
+
+        Balances, positions and tickers not in cache are fetched in parallel
+        (up to RISK_FETCH_CONCURRENCY at a time), so a batch waits about one
+        exchange round trip instead of two per account in sequence; snapshot
+        and price then read from cache.
+
+        Args:
+            accounts: CCXTClient per account ID
+            symbols: (CCXT symbol, CCXTClient) pairs to price
+
+        Returns:
+            Fetch error per account ID or (exchange ID, symbol) that failed
+        """
+        executor = _get_fetch_executor()
+        pending_accounts = {}
+        pending_prices = {}
+        for account_id, client in accounts.items():
+            if self.snapshots.get(account_id) is None:
+                pending_accounts[account_id] = (
+                    executor.submit(client.fetch_balance),
+                    executor.submit(client.fetch_positions)
+                )
+        for symbol, client in symbols:
+            key = (client.exchange.id, symbol)
+            if key not in pending_prices and self.prices.get(key) is None:
+                pending_prices[key] = executor.submit(client.fetch_ticker, symbol)
+
+        errors = {}
+        for account_id, (balance, positions) in pending_accounts.items():
+            try:
+                self._store_snapshot(account_id, balance.result(), positions.result())
+            except Exception as e:
+                errors[account_id] = e
+        for key, ticker in pending_prices.items():
+            try:
+                price = ticker.result().get('last')
+            except Exception as e:
+                errors[key] = e
+                continue
+            if price:
+                self.prices.set(key, price)
+        return errors
+
+    def record_fill(self, account_id: Hashable, notional: float):
+        """Add a new fill's notional to the cached exposure"""
+        snapshot = self.snapshots.get(account_id)
+        if snapshot is not None:
+            snapshot.exposure += abs(notional)
+
+
+# Singleton instance
+_risk_engine = None
+
+
+def get_risk_engine() -> RiskEngine:
+    """Get or create RiskEngine singleton"""
+    global _risk_engine
+
+    if _risk_engine is None:
+        _risk_engine = RiskEngine()
+
+    return _risk_engine
@@ -0,0 +1,94 @@
+"""
+Consistent-hash sharding of users across worker processes
+Each user token maps to exactly one live worker, so a user's signals are
+processed in order by a single process, and only the users of a dead or
+newly started worker move when membership changes
+"""
+import bisect
+import hashlib
+from typing import Iterable, List, Optional
+
+
+def _hash(key: str) -> int:
+    """Stable 64-bit hash (Python's hash() is salted per process)"""
+    return int.from_bytes(hashlib.md5(key.encode()).digest()[:8], "big")
+
+
+class HashRing:
+    """
+    Consistent-hash ring over worker indices
+
+    Each worker is placed on the ring at `replicas` virtual points to keep
+    the key ranges balanced.
+    """
+
+    def __init__(self, nodes: Iterable[int], replicas: int = 100):
+        """
+        Build the ring
+
+        Args:
+            nodes: Live worker indices
+            replicas: Virtual points per worker
+        """
+        self.nodes = sorted(set(nodes))
+        self._points: List[int] = []
+        self._owners: List[int] = []
+
+        ring = sorted(
+            (_hash(f"worker-{node}#{replica}"), node)
+            for node in self.nodes
+            for replica in range(replicas)
+        )
+        for point, node in ring:
+            self._points.append(point)
+            self._owners.append(node)
+
+    def node_for(self, key: str) -> Optional[int]:
+        """
+        Worker index owning a key
+
+        Args:
+            key: User token
+
+        Returns:
+            Worker index, or None if the ring is empty
+        """
+        if not self._points:
+            return None
+
+        index = bisect.bisect(self._points, _hash(key)) % len(self._points)
+        return self._owners[index]
+
+
+class ShardMembership:
+    """
+    Worker membership shared between the supervisor and its processes
+
+    Backed by a multiprocessing Array of alive flags and a generation
+    counter bumped on every join/leave, so workers only rebuild their
+    ring when membership actually changes.
+    """
+
+    def __init__(self, alive, generation):
+        """
+        Args:
+            alive: multiprocessing Array('b') with one flag per worker slot
+            generation: multiprocessing Value('i') bumped on membership change
+        """
+        self.alive = alive
+        self.generation = generation
+
+    def set_alive(self, index: int, is_alive: bool):
+        """Mark a worker slot as joined or gone and bump the generation"""
+        with self.generation.get_lock():
+            if bool(self.alive[index]) != is_alive:
+                self.alive[index] = 1 if is_alive else 0
+                self.generation.value += 1
+
+    def members(self) -> List[int]:
+        """Indices of live workers"""
+        return [index for index, flag in enumerate(self.alive) if flag]
+
+    def current_generation(self) -> int:
+        """Current membership generation"""
+        return self.generation.value
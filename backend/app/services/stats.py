@@ -0,0 +1,208 @@
+"""
+Incrementally maintained per-user trading aggregates
+Updated by the worker in the same transaction as the signal outcome, so
+dashboard reads are a single primary-key lookup regardless of history size
+"""
+from datetime import datetime
+from typing import Optional, Dict, Any, List
+
+from sqlalchemy.orm import Session
+
+from ..models import Signal, Order, UserStats
+
+
+# Upper bounds (ms) of the signal latency histogram buckets; last bucket is open-ended
+LATENCY_BUCKETS_MS = [10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000, 60000]
+
+
+def get_or_create_stats(db: Session, user_id: int) -> UserStats:
+    """
+    Load a user's stats row for update, creating it if missing
+
+    Args:
+        db: Database session
+        user_id: User ID
+
+    Returns:
+        UserStats row (locked until the surrounding transaction ends)
+    """
+    stats = db.query(UserStats).filter(
+        UserStats.user_id == user_id
+    ).with_for_update().first()
+
+    if stats is None:
+        stats = UserStats(
+            user_id=user_id,
+            signals_total=0,
+            signals_completed=0,
+            signals_failed=0,
+            orders_total=0,
+            orders_filled=0,
+            volume=0.0,
+            notional=0.0,
+            realized_pnl=0.0,
+            positions={},
+            latency_histogram=[0] * (len(LATENCY_BUCKETS_MS) + 1)
+        )
+        db.add(stats)
+
+    return stats
+
+
+def _latency_bucket(latency_ms: float) -> int:
+    """Index of the histogram bucket for a latency"""
+    for index, bound in enumerate(LATENCY_BUCKETS_MS):
+        if latency_ms <= bound:
+            return index
+    return len(LATENCY_BUCKETS_MS)
+
+
+def _apply_fill(stats: UserStats, symbol: str, signed_quantity: float, price: float):
+    """
+    Update position and realized PnL for a fill (average cost method)
+
+    Args:
+        stats: UserStats row
+        symbol: Trading symbol
+        signed_quantity: Filled quantity, positive for buys and negative for sells
+        price: Average fill price
+    """
+    # JSON columns are only flagged dirty on reassignment, so copy before mutating
+    positions = dict(stats.positions or {})
+    quantity, entry_price = positions.get(symbol, [0.0, 0.0])
+
+    if quantity == 0 or (quantity > 0) == (signed_quantity > 0):
+        # Opening or increasing: blend the entry price
+        new_quantity = quantity + signed_quantity
+        entry_price = (abs(quantity) * entry_price + abs(signed_quantity) * price) / abs(new_quantity)
+    else:
+        # Reducing, closing or flipping: realize PnL on the closed part
+        closed = min(abs(signed_quantity), abs(quantity))
+        direction = 1.0 if quantity > 0 else -1.0
+        stats.realized_pnl = (stats.realized_pnl or 0.0) + closed * (price - entry_price) * direction
+        new_quantity = quantity + signed_quantity
+        if new_quantity == 0:
+            entry_price = 0.0
+        elif (new_quantity > 0) != (quantity > 0):
+            entry_price = price
+
+    positions[symbol] = [new_quantity, entry_price]
+    stats.positions = positions
+
+
+def record_signal_outcome(db: Session, signal: Signal, order: Optional[Order] = None):
+    """
+    Fold a processed signal (and its order, if any) into the user's aggregates
+
+    Must be called before the commit that finalizes the signal, so the
+    aggregates and the signal status are persisted atomically.
+
+    Args:
+        db: Database session
+        signal: Signal with a resolved user_id and a final status
+        order: Order recorded for the signal, if one was placed
+    """
+    if signal.user_id is None:
+        return
+
+    stats = get_or_create_stats(db, signal.user_id)
+    stats.signals_total += 1
+    if signal.status == "completed":
+        stats.signals_completed += 1
+    else:
+        stats.signals_failed += 1
+    stats.last_signal_at = signal.received_at
+
+    if signal.received_at and signal.processed_at:
+        latency_ms = (signal.processed_at - signal.received_at).total_seconds() * 1000
+        histogram = list(stats.latency_histogram or [0] * (len(LATENCY_BUCKETS_MS) + 1))
+        histogram[_latency_bucket(latency_ms)] += 1
+        stats.latency_histogram = histogram
+
+    if order is not None:
+        stats.orders_total += 1
+        if order.status == "filled":
+            stats.orders_filled += 1
+
+        filled = order.filled_quantity or 0.0
+        if filled > 0:
+            stats.volume += filled
+            if order.average_price:
+                stats.notional += filled * order.average_price
+
+                if order.side == "buy":
+                    signed_quantity = filled
+                elif order.side == "sell":
+                    signed_quantity = -filled
+                else:
+                    # close: reduce whatever is currently open on the symbol
+                    current = (stats.positions or {}).get(order.symbol, [0.0, 0.0])[0]
+                    signed_quantity = -min(filled, abs(current)) if current > 0 else min(filled, abs(current))
+
+                if signed_quantity:
+                    _apply_fill(stats, order.symbol, signed_quantity, order.average_price)
+
+    stats.updated_at = datetime.utcnow()
+
+
+def latency_percentile(histogram: List[int], percentile: float) -> Optional[float]:
+    """
+    Approximate a latency percentile from the bucketed histogram
+
+    Args:
+        histogram: Counts per LATENCY_BUCKETS_MS bucket
+        percentile: Percentile in [0, 100]
+
+    Returns:
+        Upper bound (ms) of the bucket containing the percentile, None if empty
+        (the open-ended last bucket reports its lower bound)
+    """
+    total = sum(histogram or [])
+    if total == 0:
+        return None
+
+    threshold = total * percentile / 100.0
+    cumulative = 0
+    for index, count in enumerate(histogram):
+        cumulative += count
+        if cumulative >= threshold and count:
+            if index < len(LATENCY_BUCKETS_MS):
+                return float(LATENCY_BUCKETS_MS[index])
+            return float(LATENCY_BUCKETS_MS[-1])
+    return float(LATENCY_BUCKETS_MS[-1])
+
+
+def stats_to_dict(stats: UserStats) -> Dict[str, Any]:
+    """
+    Serialize a UserStats row for the API
+
+    Args:
+        stats: UserStats row
+
+    Returns:
+        JSON-serializable dict with derived fill rate and latency percentiles
+    """
+    histogram = stats.latency_histogram or []
+    return {
+        "user_id": stats.user_id,
+        "signals_total": stats.signals_total,
+        "signals_completed": stats.signals_completed,
+        "signals_failed": stats.signals_failed,
+        "orders_total": stats.orders_total,
+        "orders_filled": stats.orders_filled,
+        "fill_rate": stats.orders_filled / stats.orders_total if stats.orders_total else None,
+        "volume": stats.volume,
+        "notional": stats.notional,
+        "realized_pnl": stats.realized_pnl,
+        "positions": {
+            symbol: {"quantity": quantity, "average_entry_price": price}
+            for symbol, (quantity, price) in (stats.positions or {}).items()
+        },
+        "latency_ms": {
+            "p50": latency_percentile(histogram, 50),
+            "p90": latency_percentile(histogram, 90),
+            "p99": latency_percentile(histogram, 99),
+        },
+        "last_signal_at": stats.last_signal_at.isoformat() if stats.last_signal_at else None,
+        "updated_at": stats.updated_at.isoformat() if stats.updated_at else None,
+    }
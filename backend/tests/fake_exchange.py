@@ -0,0 +1,119 @@
+"""
+In-memory stand-in for a ccxt exchange with scripted faults
+Registered on the ccxt module so CCXTClient builds it like a real exchange
+"""
+import time
+import threading
+from collections import Counter
+from typing import Optional, Dict, Any, List
+
+import ccxt
+
+
+class LostRequest:
+    """Fault: the request never reaches the exchange"""
+
+    def __init__(self, error: Exception):
+        self.error = error
+
+
+class LostResponse:
+    """Fault: the exchange applies the request but the response is lost"""
+
+    def __init__(self, error: Exception):
+        self.error = error
+
+
+class FakeExchange:
+    """
+    Minimal ccxt-like exchange
+
+    Faults and latencies are queued per method and consumed one per call.
+    Orders are kept in memory; a clientOrderId can only be used once, and a
+    reused one is rejected the way ccxt reports Bybit's 110072 error.
+    """
+
+    id = "fake"
+
+    def __init__(self, config: Optional[Dict[str, Any]] = None):
+        self.config = config or {}
+        self.timeout = 10000
+        self.orders: List[Dict[str, Any]] = []
+        self.faults: Dict[str, list] = {}
+        self.latencies: Dict[str, List[float]] = {}
+        self.calls = Counter()
+        self.timeouts_seen: List[int] = []
+        self.hidden_listings = 0  # Order listings that do not show new orders yet
+        self.sandbox = False
+        self._lock = threading.Lock()
+
+    def set_sandbox_mode(self, enabled: bool):
+        self.sandbox = enabled
+
+    def inject(self, method: str, *faults):
+        """Queue faults (exceptions, LostRequest or LostResponse) for a method"""
+        self.faults.setdefault(method, []).extend(faults)
+
+    def delay(self, method: str, *seconds: float):
+        """Queue per-call latencies for a method"""
+        self.latencies.setdefault(method, []).extend(seconds)
+
+    def _enter(self, method: str):
+        with self._lock:
+            self.calls[method] += 1
+            self.timeouts_seen.append(self.timeout)
+            latency = self.latencies[method].pop(0) if self.latencies.get(method) else 0.0
+            fault = self.faults[method].pop(0) if self.faults.get(method) else None
+        if latency:
+            time.sleep(latency)
+        if isinstance(fault, Exception):
+            raise fault
+        if isinstance(fault, LostRequest):
+            raise fault.error
+        return fault
+
+    def create_order(self, symbol, type, side, amount, price=None, params=None):
+        fault = self._enter("create_order")
+        params = params or {}
+        client_order_id = params.get("clientOrderId")
+        with self._lock:
+            if client_order_id and any(o["clientOrderId"] == client_order_id for o in self.orders):
+                raise ccxt.InvalidOrder('bybit {"retCode":110072,"retMsg":"OrderLinkedID is duplicate"}')
+            order = {
+                "id": str(len(self.orders) + 1),
+                "clientOrderId": client_order_id,
+                "symbol": symbol,
+                "type": type,
+                "side": side,
+                "amount": amount,
+                "price": price,
+                "status": "closed" if type == "market" else "open",
+                "filled": amount if type == "market" else 0.0,
+            }
+            self.orders.append(order)
+        if isinstance(fault, LostResponse):
+            raise fault.error
+        return dict(order)
+
+    def _list_orders(self, method: str, status: str, symbol, limit) -> List[Dict[str, Any]]:
+        self._enter(method)
+        with self._lock:
+            if self.hidden_listings > 0:
+                self.hidden_listings -= 1
+                return []
+            orders = [dict(o) for o in self.orders if o["symbol"] == symbol and o["status"] == status]
+        return orders[-limit:] if limit else orders
+
+    def fetch_open_orders(self, symbol=None, since=None, limit=None, params=None):
+        return self._list_orders("fetch_open_orders", "open", symbol, limit)
+
+    def fetch_closed_orders(self, symbol=None, since=None, limit=None, params=None):
+        return self._list_orders("fetch_closed_orders", "closed", symbol, limit)
+
+    def fetch_balance(self, params=None):
+        self._enter("fetch_balance")
+        return {"total": {"USDT": 1000.0}, "free": {"USDT": 1000.0}, "used": {"USDT": 0.0}}
+
+    def fetch_ticker(self, symbol, params=None):
+        self._enter("fetch_ticker")
+        return {"symbol": symbol, "last": 10.0}
@@ -0,0 +1,205 @@
+"""
+Fault-injection tests for CCXTClient retries, deadlines, hedging and circuit breaker
+"""
+import time
+
+import pytest
+
+ccxt = pytest.importorskip("ccxt")
+
+from app.services import ccxt_client
+from app.services.ccxt_client import CCXTClient, CircuitBreaker, CircuitOpenError
+
+from .fake_exchange import FakeExchange, LostRequest, LostResponse
+
+
+SYMBOL = "AVAX/USDT:USDT"
+
+
+@pytest.fixture
+def breaker(monkeypatch):
+    """Fresh, fast circuit breaker for the fake exchange"""
+    breaker = CircuitBreaker("fake", failure_threshold=3, reset_timeout=0.1)
+    monkeypatch.setattr(ccxt_client, "_circuit_breakers", {"fake": breaker})
+    return breaker
+
+
+@pytest.fixture
+def client(monkeypatch, breaker):
+    monkeypatch.setattr(ccxt, "fake", FakeExchange, raising=False)
+    monkeypatch.setattr(ccxt, "exchanges", [*ccxt.exchanges, "fake"])
+    monkeypatch.setattr(ccxt_client, "EXCHANGE_RETRY_BACKOFF", 0.001)
+    monkeypatch.setattr(ccxt_client, "EXCHANGE_MAX_RETRIES", 2)
+    monkeypatch.setattr(ccxt_client, "EXCHANGE_HEDGE_DELAY", 0.05)
+    return CCXTClient(api_key="key", api_secret="secret", test_mode=False, exchange_id="fake")
+
+
+# Idempotent order creation
+
+def test_timeout_after_order_landed_returns_original_order(client):
+    client.exchange.inject("create_order", LostResponse(ccxt.RequestTimeout("timed out")))
+
+    order = client.create_market_order(SYMBOL, "buy", 1.0)
+
+    assert len(client.exchange.orders) == 1
+    assert order["id"] == client.exchange.orders[0]["id"]
+    # Found by clientOrderId before resending
+    assert client.exchange.calls["create_order"] == 1
+
+
+def test_retry_rejected_as_duplicate_resolves_original_order(client):
+    client.exchange.inject("create_order", LostResponse(ccxt.RequestTimeout("timed out")))
+    # The landed order is not listed yet when the retry looks it up
+    client.exchange.hidden_listings = 2
+
+    order = client.create_market_order(SYMBOL, "buy", 1.0)
+
+    assert len(client.exchange.orders) == 1
+    assert order["id"] == client.exchange.orders[0]["id"]
+    assert client.exchange.calls["create_order"] == 2
+
+
+def test_lost_request_is_resent_once(client):
+    client.exchange.inject("create_order", LostRequest(ccxt.NetworkError("connection reset")))
+
+    order = client.create_limit_order(SYMBOL, "sell", 2.0, 30.0)
+
+    assert len(client.exchange.orders) == 1
+    assert order["clientOrderId"] == client.exchange.orders[0]["clientOrderId"]
+
+
+def test_first_attempt_rejection_is_not_looked_up(client):
+    client.exchange.inject("create_order", ccxt.InvalidOrder("qty too small"))
+
+    with pytest.raises(ccxt.InvalidOrder):
+        client.create_market_order(SYMBOL, "buy", 0.0001)
+
+    assert client.exchange.calls["fetch_open_orders"] == 0
+    assert client.exchange.orders == []
+
+
+def test_resume_returns_order_sent_earlier(client):
+    params = {"clientOrderId": "hx-resume-1"}
+    first = client.create_market_order(SYMBOL, "buy", 1.0, params=params)
+
+    again = client.create_market_order(SYMBOL, "buy", 1.0, params=params, resume=True)
+
+    assert again["id"] == first["id"]
+    assert len(client.exchange.orders) == 1
+
+
+# Deadlines
+
+def test_deadline_bounds_all_retries(client, monkeypatch):
+    monkeypatch.setitem(ccxt_client.OPERATION_DEADLINES, "fetch_balance", 0.2)
+    monkeypatch.setattr(ccxt_client, "EXCHANGE_MAX_RETRIES", 100)
+    client.circuit_breaker.failure_threshold = 1000
+    client.exchange.delay("fetch_balance", *[0.06] * 20)
+    client.exchange.inject("fetch_balance", *[ccxt.RequestTimeout("timed out")] * 20)
+
+    started = time.monotonic()
+    with pytest.raises(ccxt.RequestTimeout):
+        client._call("fetch_balance", client.exchange.fetch_balance)
+
+    assert time.monotonic() - started < 0.4
+    assert 2 <= client.exchange.calls["fetch_balance"] < 20
+    # Each HTTP timeout is cut down to what is left of the deadline
+    assert all(timeout <= 200 for timeout in client.exchange.timeouts_seen)
+
+
+# Circuit breaker
+
+def test_breaker_opens_after_consecutive_failures(client, breaker, monkeypatch):
+    monkeypatch.setattr(ccxt_client, "EXCHANGE_MAX_RETRIES", 0)
+    client.exchange.inject("fetch_balance", *[ccxt.NetworkError("down")] * 3)
+
+    for _ in range(3):
+        with pytest.raises(ccxt.NetworkError):
+            client.fetch_balance()
+
+    assert breaker.state == "open"
+    with pytest.raises(CircuitOpenError):
+        client.fetch_balance()
+    assert client.exchange.calls["fetch_balance"] == 3
+
+
+def test_breaker_half_open_trial_success_closes(client, breaker, monkeypatch):
+    monkeypatch.setattr(ccxt_client, "EXCHANGE_MAX_RETRIES", 0)
+    client.exchange.inject("fetch_balance", *[ccxt.NetworkError("down")] * 3)
+    for _ in range(3):
+        with pytest.raises(ccxt.NetworkError):
+            client.fetch_balance()
+
+    time.sleep(breaker.reset_timeout)
+    assert client.fetch_balance()["total"]["USDT"] == 1000.0
+
+    assert breaker.state == "closed"
+    assert breaker.consecutive_failures == 0
+
+
+def test_breaker_half_open_trial_failure_reopens(client, breaker, monkeypatch):
+    monkeypatch.setattr(ccxt_client, "EXCHANGE_MAX_RETRIES", 0)
+    client.exchange.inject("fetch_balance", *[ccxt.NetworkError("down")] * 4)
+    for _ in range(3):
+        with pytest.raises(ccxt.NetworkError):
+            client.fetch_balance()
+
+    time.sleep(breaker.reset_timeout)
+    with pytest.raises(ccxt.NetworkError):
+        client.fetch_balance()
+
+    assert breaker.state == "open"
+    with pytest.raises(CircuitOpenError):
+        client.fetch_balance()
+
+
+def test_exchange_errors_do_not_trip_breaker(client, breaker):
+    client.exchange.inject("create_order", *[ccxt.InsufficientFunds("no margin")] * 5)
+
+    for _ in range(5):
+        with pytest.raises(ccxt.InsufficientFunds):
+            client.create_market_order(SYMBOL, "buy", 1.0)
+
+    assert breaker.state == "closed"
+
+
+# Hedging
+
+def test_slow_read_is_hedged(client):
+    client.exchange.delay("fetch_ticker", 1.0, 0.0)
+
+    started = time.monotonic()
+    ticker = client.fetch_ticker(SYMBOL)
+
+    assert ticker["last"] == 10.0
+    assert time.monotonic() - started < 0.5
+    assert client.exchange.calls["fetch_ticker"] == 2
+
+
+def test_fast_read_is_not_hedged(client):
+    client.fetch_ticker(SYMBOL)
+
+    assert client.exchange.calls["fetch_ticker"] == 1
+
+
+# Test mode
+
+def test_test_mode_serves_live_public_tickers(client):
+    public = CCXTClient(test_mode=True, exchange_id="fake")
+    account = CCXTClient(api_key="key", api_secret="secret", test_mode=True, exchange_id="fake", market_data=public)
+
+    assert account.fetch_ticker(SYMBOL)["last"] == 10.0
+    assert public.exchange.calls["fetch_ticker"] == 1
+    assert not public.exchange.sandbox
+    assert account.exchange.sandbox
+    # Trading stays simulated
+    assert account.create_market_order(SYMBOL, "buy", 1.0)["info"]["test_mode"]
+    assert account.exchange.orders == []
+
+
+# Exchange validation
+
+@pytest.mark.parametrize("exchange_id", ["Exchange", "base", "decimal_to_precision", "nope"])
+def test_non_exchange_ids_are_rejected(exchange_id):
+    with pytest.raises(ValueError, match="Unsupported exchange"):
+        CCXTClient(test_mode=True, exchange_id=exchange_id)
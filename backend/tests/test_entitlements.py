@@ -0,0 +1,77 @@
+"""
+Tests for the in-memory entitlement index
+"""
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.db import Base
+from app.models import User, Subscription
+from app.services.entitlements import EntitlementIndex
+
+
+@pytest.fixture
+def db():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(bind=engine)
+    session = sessionmaker(bind=engine)()
+    for user_id in (1, 2):
+        session.add(User(id=user_id, username=f"user{user_id}", email=f"user{user_id}@example.com", token=f"token{user_id}"))
+    session.commit()
+    yield session
+    session.close()
+
+
+def subscription(user_id, updated_at, **fields):
+    return Subscription(
+        user_id=user_id,
+        status=fields.pop("status", "active"),
+        expires_at=fields.pop("expires_at", datetime.utcnow() + timedelta(days=30)),
+        updated_at=updated_at,
+        **fields
+    )
+
+
+def test_refresh_catches_update_committed_behind_watermark(db):
+    now = datetime.utcnow()
+    late = subscription(1, now - timedelta(seconds=20))
+    db.add_all([late, subscription(2, now)])
+    db.commit()
+    index = EntitlementIndex()
+    index.load(db)
+    assert index.is_entitled(1)
+
+    # Cancelled by a writer whose clock is behind the row already seen
+    late.status = "cancelled"
+    late.updated_at = now - timedelta(seconds=10)
+    db.commit()
+    index.refresh(db)
+
+    assert not index.is_entitled(1)
+    assert index.is_entitled(2)
+
+
+def test_expiry_without_refresh(db):
+    db.add(subscription(1, datetime.utcnow(), expires_at=datetime.utcnow() + timedelta(milliseconds=50)))
+    db.commit()
+    index = EntitlementIndex()
+    index.load(db)
+    assert index.is_entitled(1)
+
+    index._expire(datetime.utcnow() + timedelta(seconds=1))
+
+    assert not index.is_entitled(1)
+
+
+def test_repeated_refresh_does_not_grow_expiry_heap(db):
+    db.add(subscription(1, datetime.utcnow()))
+    db.commit()
+    index = EntitlementIndex()
+    index.load(db)
+
+    for _ in range(5):
+        index.refresh(db)
+
+    assert len(index._expiry_heap) == 1
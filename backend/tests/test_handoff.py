@@ -0,0 +1,123 @@
+"""
+Tests for the co-located signal journal and in-process hand-off
+"""
+import json
+import asyncio
+
+import pytest
+
+from app.services import handoff
+from app.services.handoff import SignalJournal, InProcessHandoff
+
+
+@pytest.fixture
+def journal_path(tmp_path, monkeypatch):
+    monkeypatch.setattr(handoff, "HANDOFF_RETRY_DELAY", 0.001)
+    return str(tmp_path / "signals.journal")
+
+
+def record(journal_id):
+    return {"journal_id": journal_id, "token": "token", "action": "buy", "symbol": "AVAXUSDT"}
+
+
+def journal_lines(path):
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f]
+
+
+class FlakyHandler:
+    """Handler failing a given number of times per symbol, recording every run"""
+
+    def __init__(self, failures=None):
+        self.failures = dict(failures or {})
+        self.calls = []
+
+    def __call__(self, record, replayed):
+        self.calls.append((record["symbol"], replayed))
+        if self.failures.get(record["symbol"], 0) > 0:
+            self.failures[record["symbol"]] -= 1
+            raise RuntimeError("database unavailable")
+
+
+def run_handoff(path, handler, symbols, expected_calls):
+    """Submit one signal per symbol; stop after expected_calls runs, once the last signal is acked"""
+    async def scenario():
+        sink = InProcessHandoff(SignalJournal(path), handler)
+        await sink.start()
+        for symbol in symbols:
+            last = await sink.submit("token", "buy", symbol, 1.0, None)
+        while len(handler.calls) < expected_calls or last["journal_id"] in sink.journal._pending:
+            await asyncio.sleep(0.005)
+        await sink.stop()
+
+    asyncio.run(asyncio.wait_for(scenario(), timeout=5))
+
+
+# SignalJournal
+
+def test_unacknowledged_skips_acks_and_torn_lines(journal_path):
+    journal = SignalJournal(journal_path)
+    journal.append(record("a"))
+    journal.append(record("b"))
+    journal.ack("a")
+    journal.close()
+    with open(journal_path, "a", encoding="utf-8") as f:
+        f.write('{"record": {"journal_id": "c", "tok')
+
+    replayed = SignalJournal(journal_path).unacknowledged()
+
+    assert [r["journal_id"] for r in replayed] == ["b"]
+
+
+def test_compact_keeps_only_unacknowledged_records(journal_path):
+    journal = SignalJournal(journal_path)
+    for journal_id in ("a", "b", "c"):
+        journal.append(record(journal_id))
+    journal.ack("b")
+
+    journal.compact()
+    journal.append(record("d"))
+    journal.close()
+
+    assert journal.acked_since_compact == 0
+    assert [line["record"]["journal_id"] for line in journal_lines(journal_path)] == ["a", "c", "d"]
+    assert [r["journal_id"] for r in SignalJournal(journal_path).unacknowledged()] == ["a", "c", "d"]
+
+
+# InProcessHandoff
+
+def test_failed_record_is_retried_in_place_before_later_ones(journal_path):
+    handler = FlakyHandler({"AVAXUSDT": 2})
+
+    run_handoff(journal_path, handler, ["AVAXUSDT", "BTCUSDT"], expected_calls=4)
+
+    # Retries run as replays (the row may have been written) and hold back the next record
+    assert handler.calls == [("AVAXUSDT", False), ("AVAXUSDT", True), ("AVAXUSDT", True), ("BTCUSDT", False)]
+    assert SignalJournal(journal_path).unacknowledged() == []
+
+
+def test_record_is_left_for_replay_after_max_attempts(journal_path, monkeypatch):
+    monkeypatch.setattr(handoff, "HANDOFF_MAX_ATTEMPTS", 3)
+    handler = FlakyHandler({"AVAXUSDT": 100})
+
+    run_handoff(journal_path, handler, ["AVAXUSDT", "BTCUSDT"], expected_calls=4)
+
+    assert handler.calls.count(("AVAXUSDT", True)) == 2
+    assert handler.calls[-1] == ("BTCUSDT", False)
+    assert [r["symbol"] for r in SignalJournal(journal_path).unacknowledged()] == ["AVAXUSDT"]
+
+
+def test_replayed_records_run_first_and_journal_is_compacted(journal_path, monkeypatch):
+    monkeypatch.setattr(handoff, "JOURNAL_COMPACT_EVERY", 2)
+    journal = SignalJournal(journal_path)
+    journal.append({**record("left-over"), "symbol": "ETHUSDT"})
+    journal.close()
+    handler = FlakyHandler()
+
+    run_handoff(journal_path, handler, ["AVAXUSDT", "BTCUSDT"], expected_calls=3)
+
+    assert handler.calls == [("ETHUSDT", True), ("AVAXUSDT", False), ("BTCUSDT", False)]
+    # Compacted after the second ack: only the third record (pending then) and its ack are left
+    lines = journal_lines(journal_path)
+    assert [line["record"]["symbol"] for line in lines if "record" in line] == ["BTCUSDT"]
+    assert len(lines) == 2 and lines[1] == {"ack": lines[0]["record"]["journal_id"]}
@@ -0,0 +1,105 @@
+"""
+Tests for batch risk evaluation
+"""
+import time
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("numpy")
+
+from app.services.risk import RiskEngine, RiskRequest, evaluate_batch
+
+
+def buy(account, quantity=6.0, price=100.0, **limits):
+    return RiskRequest(equity=1000.0, exposure=0.0, quantity=quantity, price=price, account=account, **limits)
+
+
+def test_same_account_orders_share_leverage_headroom():
+    # 1000 equity at 2x leverage: 2000 notional, 20 units at 100
+    decisions = evaluate_batch([buy(1, max_leverage=2) for _ in range(5)])
+
+    assert [d.quantity for d in decisions[:3]] == [6.0, 6.0, 6.0]
+    assert decisions[3].allowed and decisions[3].reduced and decisions[3].quantity == pytest.approx(2.0)
+    assert not decisions[4].allowed
+    assert decisions[4].reason == "Exposure limit reached"
+
+
+def test_other_accounts_and_closes_do_not_consume_headroom():
+    requests = [
+        buy(1, quantity=15.0, max_leverage=2),
+        buy(2, quantity=15.0, max_leverage=2),
+        RiskRequest(equity=1000.0, exposure=0.0, quantity=None, price=None, closing=True, account=1),
+        buy(1, quantity=15.0, max_leverage=2),
+    ]
+
+    decisions = evaluate_batch(requests)
+
+    assert [d.quantity for d in decisions[:3]] == [15.0, 15.0, None]
+    assert decisions[3].quantity == pytest.approx(5.0)
+
+
+def test_per_order_cap_counts_capped_notional():
+    decisions = evaluate_batch([buy(1, quantity=10.0, max_leverage=2, max_notional=500.0) for _ in range(5)])
+
+    assert [d.quantity for d in decisions[:4]] == [5.0, 5.0, 5.0, 5.0]
+    assert not decisions[4].allowed
+
+
+def test_requests_without_account_are_independent():
+    decisions = evaluate_batch([buy(None, quantity=15.0, max_leverage=2) for _ in range(3)])
+
+    assert [d.quantity for d in decisions] == [15.0, 15.0, 15.0]
+
+
+class SlowClient:
+    """Account client whose every read takes latency seconds"""
+
+    def __init__(self, latency=0.1, error=None):
+        self.exchange = SimpleNamespace(id="fake")
+        self.latency = latency
+        self.error = error
+        self.calls = 0
+
+    def _read(self, value):
+        self.calls += 1
+        time.sleep(self.latency)
+        if self.error:
+            raise self.error
+        return value
+
+    def fetch_balance(self):
+        return self._read({"total": {"USDT": 1000.0}})
+
+    def fetch_positions(self):
+        return self._read([{"notional": -250.0}])
+
+    def fetch_ticker(self, symbol):
+        return self._read({"last": 10.0})
+
+
+def test_warm_fetches_missing_snapshots_concurrently():
+    engine = RiskEngine()
+    clients = {account: SlowClient() for account in range(5)}
+    failing = SlowClient(error=RuntimeError("down"))
+
+    started = time.monotonic()
+    errors = engine.warm({**clients, "failing": failing}, [("AVAX/USDT:USDT", clients[0])])
+
+    assert time.monotonic() - started < 0.35
+    assert list(errors) == ["failing"]
+    # Later reads are served from cache
+    assert engine.snapshot(3, clients[3]).exposure == 250.0
+    assert engine.price("AVAX/USDT:USDT", clients[0]) == 10.0
+    assert clients[3].calls == 2
+    assert clients[0].calls == 3
+
+
+def test_warm_skips_cached_accounts():
+    engine = RiskEngine()
+    client = SlowClient(latency=0.0)
+    engine.warm({1: client}, [])
+
+    engine.warm({1: client}, [])
+
+    assert client.calls == 2
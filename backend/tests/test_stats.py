@@ -0,0 +1,173 @@
+"""
+Tests for the incremental per-user trading aggregates
+"""
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.db import Base
+from app.models import User, Signal, Order, UserStats
+from app.services.stats import LATENCY_BUCKETS_MS, _apply_fill, latency_percentile, record_signal_outcome
+
+
+SYMBOL = "AVAXUSDT"
+
+
+@pytest.fixture
+def db():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(bind=engine)
+    session = sessionmaker(bind=engine)()
+    session.add(User(id=1, username="user1", email="user1@example.com", token="token1"))
+    session.commit()
+    yield session
+    session.close()
+
+
+def empty_stats():
+    return UserStats(user_id=1, realized_pnl=0.0, positions={})
+
+
+def position(stats):
+    return stats.positions[SYMBOL]
+
+
+# Average-cost PnL
+
+def test_adding_to_a_position_blends_the_entry_price():
+    stats = empty_stats()
+
+    _apply_fill(stats, SYMBOL, 2.0, 10.0)
+    _apply_fill(stats, SYMBOL, 2.0, 20.0)
+
+    assert position(stats) == [4.0, pytest.approx(15.0)]
+    assert stats.realized_pnl == 0.0
+
+
+def test_reducing_a_long_realizes_pnl_and_keeps_the_entry_price():
+    stats = empty_stats()
+    _apply_fill(stats, SYMBOL, 4.0, 15.0)
+
+    _apply_fill(stats, SYMBOL, -1.0, 20.0)
+
+    assert position(stats) == [3.0, 15.0]
+    assert stats.realized_pnl == pytest.approx(5.0)
+
+
+def test_closing_a_short_realizes_pnl_and_resets_the_entry_price():
+    stats = empty_stats()
+    _apply_fill(stats, SYMBOL, -3.0, 20.0)
+
+    _apply_fill(stats, SYMBOL, 3.0, 18.0)
+
+    assert position(stats) == [0.0, 0.0]
+    assert stats.realized_pnl == pytest.approx(6.0)
+
+
+def test_flipping_realizes_the_closed_part_and_reopens_at_the_fill_price():
+    stats = empty_stats()
+    _apply_fill(stats, SYMBOL, 2.0, 10.0)
+
+    _apply_fill(stats, SYMBOL, -5.0, 12.0)
+
+    assert position(stats) == [-3.0, 12.0]
+    assert stats.realized_pnl == pytest.approx(4.0)
+
+
+def test_fill_reassigns_positions_so_the_json_column_is_flagged_dirty():
+    stats = empty_stats()
+    before = stats.positions
+
+    _apply_fill(stats, SYMBOL, 1.0, 10.0)
+
+    assert stats.positions is not before
+    assert before == {}
+
+
+# record_signal_outcome
+
+def fill(side, quantity, price, received_at=None, latency_ms=40.0):
+    received_at = received_at or datetime(2024, 1, 1)
+    signal = Signal(
+        token="token1",
+        user_id=1,
+        action=side,
+        symbol=SYMBOL,
+        status="completed",
+        received_at=received_at,
+        processed_at=received_at + timedelta(milliseconds=latency_ms)
+    )
+    order = Order(
+        signal_id=1,
+        user_id=1,
+        symbol=SYMBOL,
+        side=side,
+        order_type="market",
+        quantity=quantity,
+        filled_quantity=quantity,
+        average_price=price,
+        status="filled"
+    )
+    return signal, order
+
+
+def test_close_reduces_the_open_position_only(db):
+    record_signal_outcome(db, *fill("sell", 2.0, 30.0))
+
+    # A close larger than the position only covers what is open
+    record_signal_outcome(db, *fill("close", 5.0, 25.0))
+    stats = db.query(UserStats).one()
+
+    assert position(stats) == [0.0, 0.0]
+    assert stats.realized_pnl == pytest.approx(10.0)
+    assert stats.signals_total == 2
+    assert stats.orders_filled == 2
+    assert stats.volume == pytest.approx(7.0)
+
+
+def test_close_without_position_changes_nothing(db):
+    record_signal_outcome(db, *fill("close", 1.0, 25.0))
+    stats = db.query(UserStats).one()
+
+    assert stats.positions == {}
+    assert stats.realized_pnl == 0.0
+    assert stats.orders_total == 1
+
+
+def test_latency_is_added_to_its_histogram_bucket(db):
+    record_signal_outcome(db, *fill("buy", 1.0, 10.0, latency_ms=40.0))
+    record_signal_outcome(db, *fill("buy", 1.0, 10.0, latency_ms=90000.0))
+    histogram = db.query(UserStats).one().latency_histogram
+
+    assert histogram[LATENCY_BUCKETS_MS.index(50)] == 1
+    assert histogram[-1] == 1
+    assert sum(histogram) == 2
+
+
+# Latency percentiles
+
+def histogram_with(**counts):
+    histogram = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+    for bound, count in counts.items():
+        index = len(LATENCY_BUCKETS_MS) if bound == "over" else LATENCY_BUCKETS_MS.index(int(bound[1:]))
+        histogram[index] = count
+    return histogram
+
+
+def test_percentiles_report_the_bucket_upper_bound():
+    histogram = histogram_with(b10=50, b100=40, b1000=10)
+
+    assert latency_percentile(histogram, 50) == 10.0
+    assert latency_percentile(histogram, 90) == 100.0
+    assert latency_percentile(histogram, 99) == 1000.0
+
+
+def test_open_ended_bucket_reports_its_lower_bound():
+    assert latency_percentile(histogram_with(b10=1, over=9), 50) == float(LATENCY_BUCKETS_MS[-1])
+
+
+def test_empty_histogram_has_no_percentile():
+    assert latency_percentile([], 50) is None
+    assert latency_percentile(histogram_with(), 99) is None
@@ -5,8 +5,14 @@ Polls the database for pending signals and executes trades via CCXT
 import os
 import sys
 import time
+import queue
+import socket
+import logging
+import threading
+import signal as signals
+import multiprocessing
 from datetime import datetime
-from typing import Optional
+from typing import Optional, List, Dict
 
 # Add parent directory to path for imports
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'backend'))
@@ -15,16 +21,23 @@ from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker, Session
 
 # Import from backend
-from app.models import Signal, Order, User, APIKey, Subscription
-from app.crypto import get_crypto_manager
+from app.models import Signal, Order, User, APIKey, RiskLimits
+from app.logs import setup_logging, log_context, bind_log_context
+from app.services.stats import record_signal_outcome
+from app.services.sharding import HashRing, ShardMembership
+from app.services.profiling import trace_signal, instrument_engine, get_profiler, get_flight_recorder
+from app.services.entitlements import get_entitlement_index
+from app.services.risk import RiskRequest, RiskDecision, evaluate_batch, get_risk_engine
 
 try:
     import ccxt
-    from app.services.ccxt_client import CCXTClient
+    from app.services.ccxt_client import CCXTClient, get_circuit_breaker_states, get_exchange_registry
 except ImportError:
     print("Warning: ccxt not installed. Install with: pip install ccxt")
     ccxt = None
     CCXTClient = None
+    get_circuit_breaker_states = None
+    get_exchange_registry = None
 
 
 # Environment variables
@@ -34,15 +47,34 @@ DATABASE_URL = os.getenv(
 )
 WORKER_POLL_INTERVAL = int(os.getenv("WORKER_POLL_INTERVAL", "5"))
 CCXT_TEST_MODE = os.getenv("CCXT_TEST_MODE", "true").lower() == "true"
+WORKER_PROCESSES = int(os.getenv("WORKER_PROCESSES", "1"))
+WORKER_RESTART_DELAY = float(os.getenv("WORKER_RESTART_DELAY", "5"))
+WORKER_BATCH_SIZE = int(os.getenv("WORKER_BATCH_SIZE", "500"))
+WORKER_MODE = os.getenv("WORKER_MODE", "poll")  # poll, colocated
+WORKER_ID = os.getenv("WORKER_ID", socket.gethostname())  # Stable name of this worker node
 
 # Database setup
+# Claimed signals are only written by this worker, so keep them loaded across
+# commits instead of re-SELECTing them on every attribute access
 engine = create_engine(DATABASE_URL, pool_pre_ping=True)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+SessionLocal = sessionmaker(autocommit=False, autoflush=False, expire_on_commit=False, bind=engine)
+instrument_engine(engine)
 
 
-def log(message: str):
-    """Log with timestamp"""
-    print(f"[{datetime.utcnow().isoformat()}] {message}", flush=True)
+logger = setup_logging("worker")
+
+
+def log(message: str, level: int = logging.INFO, sample: bool = False, **fields):
+    """
+    Log through the buffered structured pipeline (see app/logs.py)
+    
+    Args:
+        message: Log message
+        level: Logging level
+        sample: Subject to LOG_SAMPLE_RATES (high-volume success lines)
+        **fields: Extra structured fields
+    """
+    logger.log(level, message, extra={**fields, "sample": sample})
 
 
 def get_user_by_token(db: Session, token: str) -> Optional[User]:
@@ -50,12 +82,15 @@ def get_user_by_token(db: Session, token: str) -> Optional[User]:
     return db.query(User).filter(User.token == token).first()
 
 
-def get_active_subscription(db: Session, user_id: int) -> Optional[Subscription]:
-    """Check if user has active subscription"""
-    return db.query(Subscription).filter(
-        Subscription.user_id == user_id,
-        Subscription.status == "active"
-    ).first()
+def has_active_subscription(db: Session, user_id: int) -> bool:
+    """Check if user has an active, unexpired subscription (in-memory index)"""
+    index = get_entitlement_index()
+    if index.is_entitled(user_id):
+        return True
+    
+    # A miss may be a subscription activated since the last refresh
+    index.refresh(db)
+    return index.is_entitled(user_id)
 
 
 def get_active_api_key(db: Session, user_id: int) -> Optional[APIKey]:
@@ -66,7 +101,42 @@ def get_active_api_key(db: Session, user_id: int) -> Optional[APIKey]:
     ).first()
 
 
-def process_signal(db: Session, signal: Signal):
+def get_client(api_key_record: APIKey) -> "CCXTClient":
+    """Get the cached CCXT client for an API key (built for APIKey.exchange)"""
+    return get_exchange_registry(CCXT_TEST_MODE).client_for(api_key_record)
+
+
+def format_symbol(symbol: str) -> str:
+    """
+    Format symbol for CCXT (e.g., AVAXUSDT -> AVAX/USDT:USDT)
+    
+    Note: This assumes quote currency is always 4 characters (USDT)
+    TODO: Add more robust symbol parsing for different quote currencies
+    """
+    return f"{symbol[:-4]}/{symbol[-4:]}:{symbol[-4:]}"
+
+
+def client_order_id_for(signal: Signal) -> str:
+    """
+    Deterministic clientOrderId for a signal's order
+    
+    A signal re-executed after an interruption reuses it, so the order an
+    earlier attempt may have sent is found instead of placed twice.
+    """
+    return f"hx{signal.id}t{int(signal.received_at.timestamp())}"
+
+
+def fail_signal(db: Session, signal: Signal, reason: str):
+    """Mark a signal as failed, fold it into the user's stats and commit"""
+    signal.status = "failed"
+    signal.error_message = reason
+    signal.processed_at = datetime.utcnow()
+    record_signal_outcome(db, signal)
+    db.commit()
+    log(f"Signal {signal.id} failed: {reason}", logging.WARNING, status="failed")
+
+
+def process_signal(db: Session, signal: Signal, decision: Optional[RiskDecision] = None):
     """
     Process a single trading signal
     
@@ -74,75 +144,69 @@ def process_signal(db: Session, signal: Signal):
     1. Find user by token
     2. Check active subscription
     3. Get decrypted API keys
-    4. Execute trade via CCXT
-    5. Record order in database
+    4. Apply the pre-trade risk decision (see assess_risk)
+    5. Execute trade via CCXT
+    6. Record order in database
+    
+    Each execution is traced; slow ones are kept by the flight recorder.
     """
-    log(f"Processing signal {signal.id}: {signal.action} {signal.symbol} (token: {signal.token})")
+    with log_context(signal_id=signal.id, user_id=signal.user_id), trace_signal(signal.id) as trace:
+        _execute_signal(db, signal, trace, decision)
+        trace.outcome = signal.status
+
+
+def _execute_signal(db: Session, signal: Signal, trace, decision: Optional[RiskDecision]):
+    """Body of process_signal, timing each stage on the trace"""
+    log(f"Processing signal {signal.id}: {signal.action} {signal.symbol}", sample=True)
     
     try:
         # Update status to processing
         signal.status = "processing"
         db.commit()
+        trace.lap("claim")
         
         # Find user by token
         user = get_user_by_token(db, signal.token)
         if not user:
-            signal.status = "failed"
-            signal.error_message = "User not found for token"
-            signal.processed_at = datetime.utcnow()
-            db.commit()
-            log(f"  ✗ Signal {signal.id} failed: User not found")
+            fail_signal(db, signal, "User not found for token")
             return
         
         signal.user_id = user.id
         db.commit()
+        bind_log_context(user_id=user.id)
+        trace.lap("lookup_user")
         
         # Check active subscription
-        subscription = get_active_subscription(db, user.id)
-        if not subscription:
-            signal.status = "failed"
-            signal.error_message = "No active subscription"
-            signal.processed_at = datetime.utcnow()
-            db.commit()
-            log(f"  ✗ Signal {signal.id} failed: No active subscription")
+        if not has_active_subscription(db, user.id):
+            fail_signal(db, signal, "No active subscription")
             return
+        trace.lap("subscription")
         
         # Get API key
         api_key_record = get_active_api_key(db, user.id)
         if not api_key_record:
-            signal.status = "failed"
-            signal.error_message = "No active API key"
-            signal.processed_at = datetime.utcnow()
-            db.commit()
-            log(f"  ✗ Signal {signal.id} failed: No active API key")
+            fail_signal(db, signal, "No active API key")
             return
+        trace.lap("api_key")
         
-        # Decrypt API credentials
-        crypto_manager = get_crypto_manager()
-        api_key = crypto_manager.decrypt(api_key_record.api_key_enc, api_key_record.iv)
-        api_secret = crypto_manager.decrypt(api_key_record.api_secret_enc, api_key_record.iv)
-        
-        # Initialize CCXT client
+        # Initialize CCXT client (credentials are decrypted once per key)
         if CCXTClient is None:
-            signal.status = "failed"
-            signal.error_message = "CCXT not available"
-            signal.processed_at = datetime.utcnow()
-            db.commit()
-            log(f"  ✗ Signal {signal.id} failed: CCXT not installed")
+            fail_signal(db, signal, "CCXT not available")
             return
         
-        client = CCXTClient(
-            api_key=api_key,
-            api_secret=api_secret,
-            test_mode=CCXT_TEST_MODE
-        )
+        client = get_client(api_key_record)
+        symbol_formatted = format_symbol(signal.symbol)
+        trace.lap("client")
         
-        # Format symbol for CCXT (e.g., AVAXUSDT -> AVAX/USDT:USDT)
-        # Note: This assumes quote currency is always 4 characters (USDT)
-        # TODO: Add more robust symbol parsing for different quote currencies
-        symbol_formatted = f"{signal.symbol[:-4]}/{signal.symbol[-4:]}:{signal.symbol[-4:]}"
+        # Apply risk gating and sizing
+        if decision is not None and not decision.allowed:
+            fail_signal(db, signal, f"Risk check rejected: {decision.reason}")
+            return
+        amount = decision.quantity if decision is not None else signal.quantity
         
-        # Execute trade based on action
+        # Execute trade based on action (idempotent across re-executions)
+        order_params = {'clientOrderId': client_order_id_for(signal)}
+        resume = signal.attempts > 1
         order_response = None
         
         if signal.action == "buy":
@@ -150,14 +214,18 @@ def process_signal(db: Session, signal: Signal):
                 order_response = client.create_limit_order(
                     symbol=symbol_formatted,
                     side="buy",
-                    amount=signal.quantity or 1.0,
-                    price=signal.price
+                    amount=amount or 1.0,
+                    price=signal.price,
+                    params=order_params,
+                    resume=resume
                 )
             else:
                 order_response = client.create_market_order(
                     symbol=symbol_formatted,
                     side="buy",
-                    amount=signal.quantity or 1.0
+                    amount=amount or 1.0,
+                    params=order_params,
+                    resume=resume
                 )
         
         elif signal.action == "sell":
@@ -165,14 +233,18 @@ def process_signal(db: Session, signal: Signal):
                 order_response = client.create_limit_order(
                     symbol=symbol_formatted,
                     side="sell",
-                    amount=signal.quantity or 1.0,
-                    price=signal.price
+                    amount=amount or 1.0,
+                    price=signal.price,
+                    params=order_params,
+                    resume=resume
                 )
             else:
                 order_response = client.create_market_order(
                     symbol=symbol_formatted,
                     side="sell",
-                    amount=signal.quantity or 1.0
+                    amount=amount or 1.0,
+                    params=order_params,
+                    resume=resume
                 )
         
         elif signal.action == "close":
@@ -181,8 +253,11 @@ def process_signal(db: Session, signal: Signal):
             order_response = client.close_position(
                 symbol=symbol_formatted,
                 side="sell",
-                amount=signal.quantity
+                amount=amount,
+                params=order_params,
+                resume=resume
             )
+        trace.lap("exchange")
         
         # Record order
         order = Order(
@@ -193,7 +268,7 @@ def process_signal(db: Session, signal: Signal):
             symbol=signal.symbol,
             side=signal.action,
             order_type='limit' if signal.price else 'market',
-            quantity=signal.quantity or 1.0,
+            quantity=amount or 1.0,
             price=signal.price,
             filled_quantity=order_response.get('filled', 0.0),
             average_price=order_response.get('average'),
@@ -204,45 +279,361 @@ def process_signal(db: Session, signal: Signal):
         
         db.add(order)
         
-        # Update signal status
+        # Update signal status and per-user aggregates atomically
         signal.status = "completed"
         signal.processed_at = datetime.utcnow()
+        record_signal_outcome(db, signal, order)
         db.commit()
         
-        log(f"  ✓ Signal {signal.id} processed successfully (order: {order.order_id}, test_mode: {CCXT_TEST_MODE})")
+        # Keep the cached exposure current until the next balance refresh
+        if signal.action == "close":
+            get_risk_engine().snapshots.invalidate(api_key_record.id)
+        elif order.filled_quantity and order.average_price:
+            get_risk_engine().record_fill(api_key_record.id, order.filled_quantity * order.average_price)
+        trace.lap("record")
+        
+        log(
+            f"Signal {signal.id} processed successfully",
+            sample=True,
+            status="completed",
+            order_id=order.order_id,
+            test_mode=CCXT_TEST_MODE
+        )
     
     except Exception as e:
-        signal.status = "failed"
-        signal.error_message = str(e)
-        signal.processed_at = datetime.utcnow()
-        db.commit()
-        log(f"  ✗ Signal {signal.id} failed: {str(e)}")
+        # Discard any half-applied order/stats changes before recording the failure
+        db.rollback()
+        fail_signal(db, signal, str(e))
+
+
+def install_diagnostic_handlers():
+    """
+    Runtime diagnostics via POSIX signals
+    
+    SIGUSR1: toggle the sampling profiler (the profile is written on stop)
+    SIGUSR2: dump the slow-signal flight recorder
+    
+    The handlers only queue the request: they run on the main thread
+    between bytecodes, possibly while it holds the flight recorder or
+    logging locks, so the work itself is done by a separate thread.
+    """
+    if not hasattr(signals, "SIGUSR1"):
+        return
+    
+    # SimpleQueue.put is reentrant, hence safe to call from a signal handler
+    requests = queue.SimpleQueue()
+    
+    def run_diagnostics():
+        while True:
+            signum = requests.get()
+            try:
+                if signum == signals.SIGUSR1:
+                    report = get_profiler().toggle()
+                    if report is None:
+                        log("Profiler started")
+                    else:
+                        log(f"Profiler stopped ({report['samples']} samples), written to {get_profiler().dump()}")
+                else:
+                    log(f"Flight recorder written to {get_flight_recorder().dump()}")
+            except Exception as e:
+                log(f"Diagnostics failed: {str(e)}", logging.ERROR)
+    
+    threading.Thread(target=run_diagnostics, name="humbex-diagnostics", daemon=True).start()
+    
+    def handle(signum, frame):
+        requests.put(signum)
+    
+    signals.signal(signals.SIGUSR1, handle)
+    signals.signal(signals.SIGUSR2, handle)
+
+
+def worker_id(pid: Optional[int] = None) -> str:
+    """Owner recorded on the signals a worker process claims"""
+    return f"{WORKER_ID}:{pid or os.getpid()}"
+
+
+def fetch_pending_signal_ids(db: Session, ring: Optional[HashRing] = None, shard_index: Optional[int] = None) -> List[int]:
+    """
+    List pending signal IDs in arrival order
+
+    Users with a signal still "processing" are held off until it finishes,
+    so a user whose range just moved here is not worked on while the
+    previous owner still runs its claimed batch.
+
+    Args:
+        db: Database session
+        ring: Consistent-hash ring of live workers (None when unsharded)
+        shard_index: This worker's index on the ring
+
+    Returns:
+        IDs of pending signals owned by this worker
+    """
+    rows = db.query(Signal.id, Signal.token).filter(
+        Signal.status == "pending"
+    ).order_by(Signal.received_at, Signal.id).all()
+    busy = {token for (token,) in db.query(Signal.token).filter(Signal.status == "processing").distinct()}
+
+    return [
+        row.id for row in rows
+        if row.token not in busy and (ring is None or ring.node_for(row.token) == shard_index)
+    ]
+
+
+def claim_signals(db: Session, signal_ids: List[int]) -> List[Signal]:
+    """
+    Claim a batch of pending signals for processing
+
+    Rows already locked by another worker are skipped rather than waited
+    on. Claimed rows are marked "processing" under this process's
+    worker_id and committed before any work starts.
+    """
+    batch = db.query(Signal).filter(
+        Signal.id.in_(signal_ids),
+        Signal.status == "pending"
+    ).order_by(Signal.received_at, Signal.id).with_for_update(skip_locked=True).all()
+    
+    owner = worker_id()
+    for signal in batch:
+        signal.status = "processing"
+        signal.claimed_by = owner
+        signal.attempts += 1
+    db.commit()
+    
+    return batch
+
+
+def requeue_orphaned_signals(db: Session, claimed_by: Optional[str] = None) -> int:
+    """
+    Put signals left "processing" by a dead worker back to pending
+
+    They are re-executed with attempts > 1, so an order the dead worker
+    had already sent is found through its clientOrderId, not placed again.
+
+    Args:
+        db: Database session
+        claimed_by: worker_id of the dead process (None: every process of
+            this WORKER_ID, e.g. left over from a previous run)
+
+    Returns:
+        Number of signals requeued
+    """
+    query = db.query(Signal).filter(Signal.status == "processing")
+    if claimed_by is not None:
+        query = query.filter(Signal.claimed_by == claimed_by)
+    else:
+        query = query.filter(Signal.claimed_by.like(f"{WORKER_ID}:%"))
+    
+    count = query.update({Signal.status: "pending", Signal.claimed_by: None}, synchronize_session=False)
+    db.commit()
+    return count
+
+
+def assess_risk(db: Session, batch: List[Signal]) -> Dict[int, RiskDecision]:
+    """
+    Size and limit-check a batch of signals in one pass
 
+    Users, API keys and risk limits are loaded with one query each. Only
+    entitled users go further: their clients are built, missing balances,
+    positions and prices are fetched concurrently into the risk engine's
+    TTL caches, and the sizing/limit arithmetic runs vectorized over the
+    whole batch. Signals whose user or API key is missing get no decision;
+    process_signal reports those failures.
 
-def run_worker():
-    """Main worker loop"""
+    Signals for the same account are evaluated in batch order, each seeing
+    the notional of the ones before it.
+
+    Returns:
+        RiskDecision per signal ID
+    """
+    if CCXTClient is None:
+        return {}
+    
+    users = {
+        user.token: user
+        for user in db.query(User).filter(User.token.in_({signal.token for signal in batch}))
+    }
+    index = get_entitlement_index()
+    if not all(index.is_entitled(user.id) for user in users.values()):
+        # A miss may be a subscription activated since the last refresh
+        index.refresh(db)
+    user_ids = [user.id for user in users.values()]
+    api_keys = {}
+    for api_key_record in db.query(APIKey).filter(APIKey.user_id.in_(user_ids), APIKey.is_active == True):
+        api_keys.setdefault(api_key_record.user_id, api_key_record)
+    limits = {
+        rule.user_id: rule
+        for rule in db.query(RiskLimits).filter(RiskLimits.user_id.in_(user_ids))
+    }
+    
+    risk_engine = get_risk_engine()
+    decisions = {}
+    clients = {}
+    setup_errors = {}
+    candidates = []
+    
+    for signal in batch:
+        user = users.get(signal.token)
+        api_key_record = api_keys.get(user.id) if user else None
+        if api_key_record is None:
+            continue
+        if not index.is_entitled(user.id):
+            # Never decrypt keys or query the exchange for unsubscribed users
+            decisions[signal.id] = RiskDecision(False, None, "No active subscription")
+            continue
+        
+        if api_key_record.id not in clients and api_key_record.id not in setup_errors:
+            try:
+                clients[api_key_record.id] = get_client(api_key_record)
+            except Exception as e:
+                setup_errors[api_key_record.id] = e
+        if api_key_record.id in setup_errors:
+            decisions[signal.id] = RiskDecision(False, None, f"Risk data unavailable: {setup_errors[api_key_record.id]}")
+            continue
+        candidates.append((signal, user, api_key_record))
+    
+    # One concurrent round of exchange reads for everything not cached
+    fetch_errors = risk_engine.warm(
+        clients,
+        [
+            (format_symbol(signal.symbol), clients[api_key_record.id])
+            for signal, _, api_key_record in candidates
+            if not signal.price
+        ]
+    )
+    
+    requests = []
+    request_ids = []
+    for signal, user, api_key_record in candidates:
+        client = clients[api_key_record.id]
+        symbol = format_symbol(signal.symbol)
+        error = fetch_errors.get(api_key_record.id)
+        if error is None and not signal.price:
+            error = fetch_errors.get((client.exchange.id, symbol))
+        if error is not None:
+            decisions[signal.id] = RiskDecision(False, None, f"Risk data unavailable: {error}")
+            continue
+        
+        try:
+            # Cache hits unless an entry expired since warm
+            snapshot = risk_engine.snapshot(api_key_record.id, client)
+            price = signal.price or risk_engine.price(symbol, client)
+        except Exception as e:
+            decisions[signal.id] = RiskDecision(False, None, f"Risk data unavailable: {e}")
+            continue
+        
+        rule = limits.get(user.id)
+        requests.append(RiskRequest(
+            equity=snapshot.equity(signal.symbol[-4:]),
+            exposure=snapshot.exposure,
+            quantity=signal.quantity,
+            price=price,
+            closing=signal.action == "close",
+            equity_fraction=rule.equity_fraction if rule else None,
+            max_leverage=rule.max_leverage if rule else None,
+            max_notional=rule.max_notional if rule else None,
+            account=api_key_record.id
+        ))
+        request_ids.append(signal.id)
+    
+    decisions.update(zip(request_ids, evaluate_batch(requests)))
+    return decisions
+
+
+def assess_risk_safely(db: Session, batch: List[Signal]) -> Dict[int, RiskDecision]:
+    """assess_risk, rejecting the whole batch if the assessment itself fails"""
+    try:
+        return assess_risk(db, batch)
+    except Exception as e:
+        # Never trade unchecked: reject the batch (it is already claimed)
+        db.rollback()
+        log(f"Risk assessment failed: {str(e)}", logging.ERROR)
+        return {signal.id: RiskDecision(False, None, "Risk check failed") for signal in batch}
+
+
+def requeue_orphans_safely(claimed_by: Optional[str]):
+    """requeue_orphaned_signals in its own session, logging failures instead of raising"""
+    db = SessionLocal()
+    try:
+        count = requeue_orphaned_signals(db, claimed_by)
+        if count:
+            log(f"Requeued {count} signal(s) left processing by {claimed_by or WORKER_ID}", logging.WARNING)
+    except Exception as e:
+        db.rollback()
+        log(f"Requeue of orphaned signals failed: {str(e)}", logging.ERROR)
+    finally:
+        db.close()
+
+
+def run_worker(shard_index: Optional[int] = None, membership: Optional[ShardMembership] = None):
+    """
+    Main worker loop
+
+    Args:
+        shard_index: Worker slot when started by run_supervisor
+        membership: Shared membership used to build the hash ring
+    """
     log("=" * 60)
-    log("HUMBEX Worker starting")
+    log("HUMBEX Worker starting" + (f" (shard {shard_index})" if membership else ""))
     log(f"Database: {DATABASE_URL.split('@')[1] if '@' in DATABASE_URL else 'localhost'}")
     log(f"Poll interval: {WORKER_POLL_INTERVAL}s")
     log(f"Test mode: {CCXT_TEST_MODE}")
     log("=" * 60)
     
+    install_diagnostic_handlers()
+    
+    ring = None
+    ring_generation = None
+    if membership:
+        membership.set_alive(shard_index, True)
+    else:
+        # Sole worker of this WORKER_ID: nothing else can be processing its rows
+        requeue_orphans_safely(None)
+    
     while True:
         db = None
         try:
             db = SessionLocal()
             
+            # Rebuild the ring only when workers joined or died
+            if membership and membership.current_generation() != ring_generation:
+                ring_generation = membership.current_generation()
+                ring = HashRing(membership.members())
+                log(f"Shard {shard_index}: ring rebuilt with workers {ring.nodes}")
+            
+            # Keep subscription gating current (one watermark query per interval)
+            get_entitlement_index().maybe_refresh(db)
+            
             # Fetch pending signals
-            pending_signals = db.query(Signal).filter(
-                Signal.status == "pending"
-            ).order_by(Signal.received_at).all()
+            pending_ids = fetch_pending_signal_ids(db, ring, shard_index)
             
-            if pending_signals:
-                log(f"Found {len(pending_signals)} pending signal(s)")
+            if pending_ids:
+                log(f"Found {len(pending_ids)} pending signal(s)")
+                stranded = False
+                
+                for start in range(0, len(pending_ids), WORKER_BATCH_SIZE):
+                    # Ownership moved: re-list before claiming users that may not be ours anymore
+                    if membership and membership.current_generation() != ring_generation:
+                        break
+                    batch = claim_signals(db, pending_ids[start:start + WORKER_BATCH_SIZE])
+                    decisions = assess_risk_safely(db, batch)
+                    
+                    for signal in batch:
+                        try:
+                            process_signal(db, signal, decisions.get(signal.id))
+                        except Exception as e:
+                            # Keep going: the rest of the batch is already claimed by this process
+                            db.rollback()
+                            stranded = True
+                            log(f"Signal {signal.id} left unfinished: {str(e)}", logging.ERROR)
+                
+                if stranded:
+                    requeue_orphans_safely(worker_id())
                 
-                for signal in pending_signals:
-                    process_signal(db, signal)
+                # Surface degraded exchanges (breakers live in this process)
+                if get_circuit_breaker_states is not None:
+                    for exchange_id, state in get_circuit_breaker_states().items():
+                        if state['state'] != "closed":
+                            log(f"Circuit breaker {exchange_id} is {state['state']}", logging.WARNING, circuit_breaker=state)
             
             # Wait before next poll
             time.sleep(WORKER_POLL_INTERVAL)
@@ -252,13 +643,177 @@ def run_worker():
             break
         
         except Exception as e:
-            log(f"Worker error: {str(e)}")
+            log(f"Worker error: {str(e)}", logging.ERROR)
+            # Release what this process claimed but never finished, or its users stay held off
+            requeue_orphans_safely(worker_id())
             time.sleep(WORKER_POLL_INTERVAL)
         
         finally:
             if db:
                 db.close()
+    
+    if membership:
+        membership.set_alive(shard_index, False)
+
+
+def run_supervisor(num_workers: int):
+    """
+    Run num_workers worker processes sharded by user token
+
+    Each process owns a consistent-hash range of user tokens. When a
+    process dies its slot leaves the ring (its users move to the
+    survivors), the signals it left "processing" are put back to pending,
+    and it is restarted after WORKER_RESTART_DELAY, rejoining the ring and
+    taking its range back. SIGUSR1/SIGUSR2 sent to the supervisor are
+    forwarded to every worker (see install_diagnostic_handlers).
+    """
+    # spawn: children build their own DB engine instead of inheriting sockets
+    context = multiprocessing.get_context("spawn")
+    membership = ShardMembership(
+        context.Array("b", num_workers),
+        context.Value("i", 0)
+    )
+    processes = {}
+    restart_at = {}
+    
+    def start(index: int):
+        process = context.Process(
+            target=run_worker,
+            args=(index, membership),
+            name=f"humbex-worker-{index}",
+            daemon=True
+        )
+        process.start()
+        processes[index] = process
+        log(f"Supervisor: started worker {index} (pid {process.pid})")
+    
+    def forward(signum, frame):
+        # Diagnostics live in the workers: pass the request on to each of them
+        for process in list(processes.values()):
+            if process is not None and process.pid:
+                try:
+                    os.kill(process.pid, signum)
+                except OSError:
+                    pass
+    
+    if hasattr(signals, "SIGUSR1"):
+        signals.signal(signals.SIGUSR1, forward)
+        signals.signal(signals.SIGUSR2, forward)
+    
+    log(f"Supervisor starting {num_workers} worker process(es)")
+    requeue_orphans_safely(None)
+    for index in range(num_workers):
+        start(index)
+    
+    try:
+        while True:
+            for index, process in list(processes.items()):
+                if process is not None and not process.is_alive():
+                    log(f"Supervisor: worker {index} exited (code {process.exitcode}), rebalancing", logging.WARNING)
+                    membership.set_alive(index, False)
+                    requeue_orphans_safely(worker_id(process.pid))
+                    processes[index] = None
+                    restart_at[index] = time.time() + WORKER_RESTART_DELAY
+            
+            for index, when in list(restart_at.items()):
+                if time.time() >= when:
+                    del restart_at[index]
+                    start(index)
+            
+            time.sleep(1)
+    
+    except KeyboardInterrupt:
+        log("Supervisor shutting down...")
+        for process in processes.values():
+            if process is not None and process.is_alive():
+                process.terminate()
+        for process in processes.values():
+            if process is not None:
+                process.join(timeout=10)
+
+
+def process_journal_record(record: dict, replayed: bool):
+    """
+    Execute a signal handed off in co-located mode
+    
+    The signals row is inserted and committed on its own before execution
+    starts (write-behind), so a failure in a later stage can never roll it
+    back while the journal entry gets acknowledged. A replayed record whose
+    row is already completed or failed is skipped; one still "processing"
+    was interrupted and is re-executed, resolving any order already sent
+    through its clientOrderId.
+    """
+    db = SessionLocal()
+    try:
+        signal = None
+        if replayed:
+            signal = db.query(Signal).filter(Signal.journal_id == record["journal_id"]).first()
+            if signal is not None and signal.status in ("completed", "failed"):
+                return
+        
+        if signal is None:
+            signal = Signal(
+                token=record["token"],
+                action=record["action"],
+                symbol=record["symbol"],
+                quantity=record["quantity"],
+                price=record["price"],
+                status="processing",
+                attempts=1,
+                received_at=datetime.fromisoformat(record["received_at"]),
+                journal_id=record["journal_id"]
+            )
+            db.add(signal)
+        else:
+            signal.status = "processing"
+            signal.attempts += 1
+        db.commit()
+        
+        get_entitlement_index().maybe_refresh(db)
+        decisions = assess_risk_safely(db, [signal])
+        process_signal(db, signal, decisions.get(signal.id))
+    
+    except Exception as e:
+        log(f"Co-located handler error: {str(e)}", logging.ERROR, journal_id=record["journal_id"])
+        raise
+    
+    finally:
+        db.close()
+
+
+def run_colocated():
+    """
+    Serve the backend API and execute signals in one process
+    
+    The webhook journals each signal and hands it over an asyncio queue,
+    skipping the Postgres INSERT -> poll -> SELECT round trip.
+    """
+    import uvicorn
+    from app.main import app
+    from app.services.handoff import SignalJournal, InProcessHandoff, JOURNAL_PATH
+    
+    log("=" * 60)
+    log("HUMBEX co-located mode starting")
+    log(f"Journal: {JOURNAL_PATH}")
+    log(f"Test mode: {CCXT_TEST_MODE}")
+    log("=" * 60)
+    
+    install_diagnostic_handlers()
+    app.state.signal_sink = InProcessHandoff(SignalJournal(JOURNAL_PATH), process_journal_record)
+    
+    uvicorn.run(
+        app,
+        host=os.getenv("BACKEND_HOST", "0.0.0.0"),
+        port=int(os.getenv("BACKEND_PORT", "8000")),
+        access_log=False,
+        log_config=None
+    )
 
 
 if __name__ == "__main__":
-    run_worker()
+    if WORKER_MODE == "colocated":
+        run_colocated()
+    elif WORKER_PROCESSES > 1:
+        run_supervisor(WORKER_PROCESSES)
+    else:
+        run_worker()